@@ -2,8 +2,10 @@ from django.views.generic.base import TemplateView
 
 
 class AboutAuthorView(TemplateView):
+    query_budget = 2
     template_name = 'about/author.html'
 
 
 class AboutTechView(TemplateView):
+    query_budget = 2
     template_name = 'about/tech.html'
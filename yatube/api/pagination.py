@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class PostCursorPagination(CursorPagination):
+    """Курсор по (pub_date, id): страницы без COUNT(*) и OFFSET"""
+    page_size = settings.AMOUNT_POSTS
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = ('-pub_date', '-id')
+
+    def window(self, queryset, request, view=None):
+        """Невыполненный запрос строк страницы — те же условия, что у
+        paginate_queryset, для агрегата валидаторов"""
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request)
+        offset, reverse, position = cursor or (0, False, None)
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(ordering))
+        else:
+            queryset = queryset.order_by(*ordering)
+        if position is not None:
+            order = ordering[0]
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            queryset = queryset.filter(
+                **{f'{order.lstrip("-")}__{lookup}': position})
+        return queryset[offset:offset + page_size + 1]
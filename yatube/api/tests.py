@@ -1,3 +1,214 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from http import HTTPStatus
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+class PostApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.other = User.objects.create_user(username='ApiOther')
+        cls.group = Group.objects.create(title='Группа', slug='api-group')
+        Post.objects.bulk_create(
+            [Post(author=cls.author, group=cls.group, text=f'Пост {index}')
+             for index in range(12)]
+            + [Post(author=cls.other, text='Чужой пост')])
+
+    def setUp(self):
+        self.url = reverse('api_posts:post-list')
+
+    def test_list_is_cursor_paginated(self):
+        """Список отдается страницами с курсором и без COUNT(*)"""
+        # Агрегат валидаторов по окну страницы и сама страница
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertNotIn('count', data)
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 3)
+
+    def test_filter_by_author_and_group(self):
+        """Фильтры по автору и группе"""
+        response = self.client.get(self.url, {'author': self.other.id})
+        self.assertEqual([post['text'] for post in response.json()['results']],
+                         ['Чужой пост'])
+        response = self.client.get(self.url, {'group': self.group.id,
+                                              'page_size': 50})
+        self.assertEqual(len(response.json()['results']), 12)
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только запрошенные поля"""
+        response = self.client.get(self.url, {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+
+    def test_sparse_fields_ignored_on_write(self):
+        """?fields= не отбрасывает поля при записи"""
+        post = Post.objects.filter(author=self.other).get()
+        self.client.force_login(self.other)
+        response = self.client.patch(
+            reverse('api_posts:post-detail', args=[post.id]) + '?fields=id',
+            {'text': 'Правка'}, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['text'], 'Правка')
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+
+    def test_conditional_get(self):
+        """Неизменный список и пост отдаются 304 без сериализации"""
+        post = Post.objects.filter(author=self.other).get()
+        detail = reverse('api_posts:post-detail', args=[post.id])
+        for url in (self.url, detail):
+            response = self.client.get(url)
+            with self.assertNumQueries(1):
+                cached = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+            self.assertEqual(cached.content, b'')
+            self.assertIn('Last-Modified', response)
+        etag = self.client.get(detail)['ETag']
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_create_requires_author(self):
+        """Создать пост может только авторизованный пользователь"""
+        response = self.client.post(self.url, {'text': 'Новый'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.client.force_login(self.author)
+        response = self.client.post(self.url, {'text': 'Новый'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], self.author.username)
+
+
+class ExportApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_user(username='ExportAdmin',
+                                             is_staff=True)
+        cls.posts = [Post.objects.create(author=cls.admin, text=f'Пост {i}')
+                     for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _export(self, kind, export_format, **params):
+        response = self.client.get(
+            reverse('api_posts:export', kwargs={
+                'kind': kind, 'export_format': export_format}), params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_resumes_from_watermark(self):
+        """NDJSON выгрузка продолжается после since_id"""
+        lines = self._export('posts', 'ndjson').splitlines()
+        self.assertEqual(len(lines), 3)
+        watermark = json.loads(lines[0])['id']
+        resumed = self._export('posts', 'ndjson', since_id=watermark)
+        self.assertEqual(
+            [json.loads(line)['text'] for line in resumed.splitlines()],
+            ['Пост 1', 'Пост 2'])
+
+    def test_csv_export_has_header(self):
+        """CSV выгрузка начинается с заголовка"""
+        rows = list(csv.reader(io.StringIO(self._export('posts', 'csv'))))
+        self.assertEqual(rows[0][:2], ['id', 'text'])
+        self.assertEqual(len(rows), 4)
+
+    def test_export_requires_staff(self):
+        """Выгрузка доступна только персоналу"""
+        self.client.logout()
+        response = self.client.get(reverse(
+            'api_posts:export', kwargs={'kind': 'likes',
+                                        'export_format': 'csv'}))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_export_rows_command_state_file(self):
+        """Команда export_rows дописывает выгрузку от водяного знака"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'posts.ndjson')
+            state = os.path.join(directory, 'state')
+            call_command('export_rows', 'posts', output=output,
+                         state_file=state, stderr=io.StringIO())
+            Post.objects.create(author=self.admin, text='Пост 3')
+            call_command('export_rows', 'posts', output=output,
+                         state_file=state, stderr=io.StringIO())
+            with open(output, encoding='utf-8') as exported:
+                texts = [json.loads(line)['text'] for line in exported]
+        self.assertEqual(texts, ['Пост 0', 'Пост 1', 'Пост 2', 'Пост 3'])
+
+    def test_export_rows_failed_write_keeps_watermark(self):
+        """Строка, которую не удалось записать, не сдвигает водяной знак"""
+        class BrokenOutput(io.StringIO):
+            def write(self, value):
+                if self.tell():
+                    raise OSError('Нет места на диске')
+                return super().write(value)
+
+        with tempfile.TemporaryDirectory() as directory:
+            state = os.path.join(directory, 'state')
+            with self.assertRaises(OSError):
+                call_command('export_rows', 'posts', state_file=state,
+                             stdout=BrokenOutput(), stderr=io.StringIO())
+            with open(state) as saved:
+                self.assertEqual(int(saved.read()), self.posts[0].id)
+
+
+class FollowApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='FollowReader')
+        cls.authors = [User.objects.create_user(username=f'FollowAuthor{i}')
+                       for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def test_follow_is_idempotent(self):
+        """Повторный PUT не создает вторую подписку, DELETE — тоже"""
+        url = reverse('api_posts:follow',
+                      kwargs={'username': self.authors[0].username})
+        self.assertEqual(self.client.put(url).status_code, HTTPStatus.CREATED)
+        self.assertEqual(self.client.put(url).status_code, HTTPStatus.OK)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        for _ in range(2):
+            self.assertEqual(self.client.delete(url).status_code,
+                             HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_self_follow_rejected(self):
+        """На себя подписаться нельзя"""
+        response = self.client.put(reverse(
+            'api_posts:follow', kwargs={'username': self.reader.username}))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
 
-# Create your tests here.
+    def test_following_for_page_in_one_query(self):
+        """Проверка подписок на авторов страницы — один запрос"""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        usernames = ','.join(author.username for author in self.authors)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('api_posts:following'),
+                                       {'authors': usernames})
+        self.assertEqual(response.json(), {'following': [
+            self.authors[0].username, self.authors[2].username]})
+        self.assertEqual(
+            sum('posts_follow' in query['sql']
+                for query in captured.captured_queries), 1)
@@ -2,7 +2,8 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import PostViewSet
+from .views import (ExportView, FollowingView, FollowView, PostViewSet,
+                    TrendingView)
 
 app_name = 'api_posts'
 
@@ -11,5 +12,17 @@ router.register('api/v1/posts', PostViewSet)
 
 
 urlpatterns = [
+    path('api/v1/export/<slug:kind>.<slug:export_format>',
+         ExportView.as_view(),
+         name='export'),
+    path('api/v1/follows/',
+         FollowingView.as_view(),
+         name='following'),
+    path('api/v1/follows/<str:username>/',
+         FollowView.as_view(),
+         name='follow'),
+    path('api/v1/trending/',
+         TrendingView.as_view(),
+         name='trending'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
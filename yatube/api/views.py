@@ -1,10 +1,160 @@
-from rest_framework import generics, viewsets
-from posts.models import Post
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
+from rest_framework import permissions, status, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.utils.conditional import conditional_response
+from posts import conditional, exports, follows, trending
+from posts.models import Post, User
 from posts.serializers import PostSerializer
 
+from .pagination import PostCursorPagination
+from .permissions import IsAuthorOrReadOnly
+
 
 class PostViewSet(viewsets.ModelViewSet):
+    """Посты с курсорной пагинацией, фильтрами ?author=&group= по
+    индексированным внешним ключам и выбором полей ?fields=
+
+    GET отвечает 304 по ETag/Last-Modified без сериализации."""
+    query_budget = {'GET': 4, 'POST': 8, 'PUT': 9, 'PATCH': 9, 'DELETE': 9}
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    pagination_class = PostCursorPagination
+    permission_classes = (IsAuthorOrReadOnly,)
+    filter_params = ('author', 'group')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = PostSerializer.requested_fields(self.request)
+        related = [name for name in ('author', 'group')
+                   if not requested or name in requested]
+        if related:
+            queryset = queryset.select_related(*related)
+        for name in self.filter_params:
+            value = self.request.query_params.get(name)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({name: 'Ожидается числовой id.'})
+            queryset = queryset.filter(**{f'{name}_id': value})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        window = self.paginator.window(
+            self.filter_queryset(self.get_queryset()), request, self)
+        state = conditional.feed_state(window.values('pk'))
+        state['format'] = request.accepted_renderer.format
+        return conditional_response(
+            request, state,
+            lambda: super(PostViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        state = None
+        if str(kwargs.get('pk', '')).isdigit():
+            state = conditional.feed_state([kwargs['pk']])
+            state['format'] = request.accepted_renderer.format
+        return conditional_response(
+            request, state,
+            lambda: super(PostViewSet, self).retrieve(
+                request, *args, **kwargs))
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+
+class ExportView(APIView):
+    """Потоковая выгрузка posts/comments/likes в NDJSON или CSV.
+
+    ?since_id= продолжает выгрузку после последнего полученного id,
+    ?since= ограничивает ее датой создания (ISO 8601).
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    query_budget = 3
+
+    def perform_content_negotiation(self, request, force=False):
+        # Формат задает URL, а не заголовок Accept
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, kind, export_format):
+        if kind not in exports.EXPORTS or export_format not in exports.FORMATS:
+            raise NotFound()
+        since_id = request.query_params.get('since_id')
+        if since_id is not None and not since_id.isdigit():
+            raise ValidationError({'since_id': 'Ожидается числовой id.'})
+        since = request.query_params.get('since')
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                raise ValidationError({'since': 'Ожидается дата ISO 8601.'})
+        try:
+            rows = exports.iter_rows(kind, since_id=since_id, since=since)
+        except ValueError as error:
+            raise ValidationError({'since': str(error)})
+        response = StreamingHttpResponse(
+            exports.format_rows(rows, exports.export_fields(kind),
+                                export_format),
+            content_type=exports.FORMATS[export_format])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{kind}.{export_format}"')
+        return response
+
+
+class FollowingView(APIView):
+    """Каких авторов из ?authors=имя1,имя2 читает текущий пользователь.
+
+    Клиент передает авторов всей страницы ленты и получает ответ одним
+    запросом к базе вместо проверки каждой карточки.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    query_budget = 3
+    max_authors = 100
+
+    def get(self, request):
+        usernames = [name for name
+                     in request.query_params.get('authors', '').split(',')
+                     if name]
+        if len(usernames) > self.max_authors:
+            raise ValidationError(
+                {'authors': f'Не больше {self.max_authors} авторов.'})
+        return Response({'following': sorted(
+            follows.followed_authors(request.user, usernames))})
+
+
+class FollowView(APIView):
+    """PUT подписывает на автора, DELETE отписывает; повтор безопасен"""
+    permission_classes = (permissions.IsAuthenticated,)
+    query_budget = {'PUT': 12, 'DELETE': 9}
+
+    def put(self, request, username):
+        author = get_object_or_404(User, username=username)
+        if author.pk == request.user.pk:
+            raise ValidationError(
+                {'author': 'Нельзя подписаться на самого себя.'})
+        created = follows.follow(request.user, author)
+        return Response({'author': author.username, 'following': True},
+                        status=(status.HTTP_201_CREATED if created
+                                else status.HTTP_200_OK))
+
+    def delete(self, request, username):
+        author = get_object_or_404(User, username=username)
+        follows.unfollow(request.user, author)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
+class TrendingView(APIView):
+    """Популярные посты с текущим счетом, см. posts/trending.py"""
+    query_budget = 4
+    replica_reads = True
 
+    def get(self, request):
+        posts = trending.top_posts(settings.TRENDING_SIZE)
+        data = PostSerializer(posts, many=True,
+                              context={'request': request}).data
+        for item, post in zip(data, posts):
+            item['score'] = round(post.trending_score, 3)
+        return Response({'results': data})
@@ -0,0 +1,86 @@
+"""request.user из общего кэша вместо запроса к auth_user.
+
+Пользователь сессии читается из базы один раз и кладется в кэш на
+USER_CACHE_TIMEOUT секунд. Проверка хэша пароля в сессии остается как
+в django.contrib.auth.get_user: после смены пароля другие сессии
+разлогиниваются, даже если пользователь взят из кэша.
+
+Запись удаляется при любом сохранении пользователя (в том числе смене
+пароля и входе — меняется last_login), удалении и выходе. Пользователь
+читается из основной базы: копия (core/replication.py) могла еще не
+получить смену пароля или блокировку.
+
+QuerySet.update() и bulk_update() сигналов не шлют, поэтому, например,
+после User.objects.filter(...).update(is_active=False) нужно вызвать
+forget() для каждого затронутого id, иначе пользователь остается
+активным до истечения USER_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+
+PREFIX = 'auth_user'
+
+
+def _key(user_id):
+    return f'{PREFIX}:{user_id}'
+
+
+def get_user(request):
+    """Пользователь сессии или AnonymousUser"""
+    session = request.session
+    try:
+        user_id = get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user = cache.get(_key(user_id))
+    if user is None:
+        user = _load(load_backend(backend_path), user_id)
+        if user is None:
+            return AnonymousUser()
+        cache.set(_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+    session_hash = session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+            session_hash, user.get_session_auth_hash())):
+        session.flush()
+        return AnonymousUser()
+    return user
+
+
+def _load(backend, user_id):
+    """backend.get_user(), но всегда из основной базы"""
+    model = get_user_model()
+    try:
+        user = model._default_manager.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+    except model.DoesNotExist:
+        return None
+    can_authenticate = getattr(backend, 'user_can_authenticate', None)
+    if can_authenticate is not None and not can_authenticate(user):
+        return None
+    return user
+
+
+def forget(user_id):
+    cache.delete(_key(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_changed_user(sender, instance, **kwargs):
+    forget(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget(user.pk)
@@ -0,0 +1,342 @@
+"""Общий для всех процессов хоста кэш поверх SQLite в режиме WAL.
+
+LocMemCache у каждого воркера gunicorn свой: копии дублируются, а
+инвалидация в одном воркере не видна остальным. Этот бэкенд хранит
+записи в одном файле, который читают и пишут все процессы:
+
+* размер ограничен MAX_SIZE байт и MAX_ENTRIES записей, при переполнении
+  вытесняются давно не читанные записи (приближенный LRU: время доступа
+  обновляется не чаще раза в TOUCH_INTERVAL секунд);
+* incr/decr выполняются в транзакции BEGIN IMMEDIATE и атомарны между
+  процессами;
+* попадания, промахи и вытеснения копятся в процессе и сбрасываются в
+  таблицу статистики пачками, см. get_stats().
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.sqlite.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES
+    ('hits', 0), ('misses', 0), ('evictions', 0),
+    ('entries', 0), ('bytes', 0);
+"""
+
+STAT_NAMES = ('hits', 'misses', 'evictions')
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 60))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._flush_every = int(options.get('STATS_FLUSH_EVERY', 100))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._pending = dict.fromkeys(STAT_NAMES, 0)
+
+    # Соединения
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # После fork соединение и счетчики родителя не используем
+            if getattr(local, 'pid', None) is not None:
+                self._pending = dict.fromkeys(STAT_NAMES, 0)
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path,
+                                     timeout=self._busy_timeout,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи сразу, без апгрейда блокировки"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self, **kwargs):
+        # Django зовет close() в конце каждого запроса; соединение с
+        # локальным файлом дешево держать открытым, как у LocMemCache
+        pass
+
+    # Кодирование значений: целые храним как есть, ради атомарного incr
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    # Статистика
+
+    def _count(self, name, amount=1):
+        metrics.count(f'cache_{name}', amount)
+        with self._stats_lock:
+            self._pending[name] += amount
+            total = sum(self._pending.values())
+        if total >= self._flush_every:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        with self._stats_lock:
+            pending = {name: value for name, value in self._pending.items()
+                       if value}
+            self._pending = dict.fromkeys(STAT_NAMES, 0)
+        if not pending:
+            return
+        with self._write() as connection:
+            connection.executemany(
+                'UPDATE stats SET value = value + ? WHERE name = ?',
+                [(value, name) for name, value in pending.items()])
+
+    def get_stats(self):
+        """hits, misses, evictions, entries, bytes и доля попаданий"""
+        self._flush_stats()
+        stats = dict(self._connection().execute(
+            'SELECT name, value FROM stats'))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    # Чтение
+
+    def _touch_rows(self, keys, now):
+        stale = now - self._touch_interval
+        placeholders = ','.join('?' * len(keys))
+        self._connection().execute(
+            f'UPDATE cache SET accessed = ? '
+            f'WHERE key IN ({placeholders}) AND accessed < ?',
+            [now, *keys, stale])
+
+    def _fetch(self, keys):
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, now]).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - self._touch_interval]
+        if stale:
+            self._touch_rows(stale, now)
+        return {key: self._decode(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        found = self._fetch([key])
+        if key in found:
+            self._count('hits')
+            return found[key]
+        self._count('misses')
+        return default
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        if not made:
+            return {}
+        found = self._fetch(list(made))
+        self._count('hits', len(found))
+        self._count('misses', len(made) - len(found))
+        return {made[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [key, time.time()]).fetchone()
+        return row is not None
+
+    # Запись
+
+    def _store(self, connection, key, value, timeout, only_missing=False):
+        now = time.time()
+        row = connection.execute(
+            'SELECT size, expires FROM cache WHERE key = ?',
+            [key]).fetchone()
+        if only_missing and row is not None and (
+                row[1] is None or row[1] > now):
+            return False
+        data, size = self._encode(value)
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed, '
+            'size) VALUES (?, ?, ?, ?, ?)',
+            [key, data, timeout, now, size])
+        old_size = row[0] if row else 0
+        connection.executemany(
+            'UPDATE stats SET value = value + ? WHERE name = ?',
+            [(size - old_size, 'bytes'), (0 if row else 1, 'entries')])
+        return True
+
+    def _cull(self, connection):
+        stats = dict(connection.execute(
+            "SELECT name, value FROM stats WHERE name IN ('entries', "
+            "'bytes')"))
+        entries, size = stats['entries'], stats['bytes']
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        now = time.time()
+        # Сначала просроченные, затем давно не читанные записи
+        victims = connection.execute(
+            'SELECT key, size FROM cache '
+            'ORDER BY (expires IS NOT NULL AND expires <= ?) DESC, accessed '
+            'LIMIT ?',
+            [now, max(1, entries // self._cull_frequency)]).fetchall()
+        connection.executemany('DELETE FROM cache WHERE key = ?',
+                               [(key,) for key, _ in victims])
+        connection.executemany(
+            'UPDATE stats SET value = value + ? WHERE name = ?',
+            [(-len(victims), 'entries'),
+             (-sum(size for _, size in victims), 'bytes'),
+             (len(victims), 'evictions')])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            added = self._store(connection, key, value,
+                                self.get_backend_timeout(timeout),
+                                only_missing=True)
+            if added:
+                self._cull(connection)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            self._store(connection, key, value,
+                        self.get_backend_timeout(timeout))
+            self._cull(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        with self._write() as connection:
+            for key, value in data.items():
+                key = self.make_key(key, version=version)
+                self.validate_key(key)
+                self._store(connection, key, value, expires)
+            self._cull(connection)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [self.get_backend_timeout(timeout), key, time.time()])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(row[0])
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f"Key '{key}' is not an integer")
+            value += delta
+            data, _ = self._encode(value)
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               [data, key])
+        return value
+
+    def _remove(self, connection, keys):
+        placeholders = ','.join('?' * len(keys))
+        entries, size = connection.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache '
+            f'WHERE key IN ({placeholders})', keys).fetchone()
+        connection.execute(
+            f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+        connection.executemany(
+            'UPDATE stats SET value = value - ? WHERE name = ?',
+            [(entries, 'entries'), (size, 'bytes')])
+        return entries
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            return bool(self._remove(connection, [key]))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if keys:
+            with self._write() as connection:
+                self._remove(connection, keys)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute(
+                "UPDATE stats SET value = 0 WHERE name IN ('entries', "
+                "'bytes')")
@@ -0,0 +1,40 @@
+"""Настройка соединений SQLite под параллельную нагрузку.
+
+В журнале отката писатель блокирует читателей, а без busy_timeout
+конкурирующая запись сразу падает с «database is locked». Профиль
+DATABASE_PROFILE = 'production' задает SQLITE_PRAGMAS, которые
+применяются к каждому новому соединению:
+
+* journal_mode=WAL — читатели не ждут писателя;
+* synchronous=NORMAL — в WAL fsync только при чекпойнте, без риска
+  повредить базу;
+* mmap_size и cache_size — страницы читаются из памяти;
+* busy_timeout — запись ждет освобождения блокировки, а не падает.
+
+Вместе с CONN_MAX_AGE соединение и его настройки переживают запрос.
+Копии только для чтения (DATABASE_REPLICAS) получают лишь параметры
+чтения: журнал и синхронизация — свойства основного файла.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Меняют файл базы, поэтому к копиям только для чтения не применяются
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def apply_pragmas(connection, pragmas):
+    """connection — соединение DB-API sqlite3 или его курсор"""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name}={value}')
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    if connection.alias in getattr(settings, 'DATABASE_REPLICAS', {}):
+        pragmas = {name: value for name, value in pragmas.items()
+                   if name not in WRITE_PRAGMAS}
+    apply_pragmas(connection.connection, pragmas)
@@ -0,0 +1,22 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику общего кэша: попадания, вытеснения, размер'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default',
+                            help='Алиас кэша из settings.CACHES')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'get_stats'):
+            raise CommandError(
+                f'Бэкенд {type(cache).__name__} не ведет статистику')
+        stats = cache.get_stats()
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {stats['hit_ratio']:.1%}\n"
+            f"Записей: {stats['entries']}, байт: {stats['bytes']}, "
+            f"вытеснено: {stats['evictions']}")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import stress
+
+
+class Command(BaseCommand):
+    help = ('Параллельные чтения и записи по копии базы: пропускная '
+            'способность профилей default и production')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--profiles', nargs='+',
+                            default=list(stress.profiles()),
+                            choices=list(stress.profiles()))
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']['NAME']
+        for name in options['profiles']:
+            try:
+                report = stress.run_profile(
+                    source, name, readers=options['readers'],
+                    writers=options['writers'], seconds=options['seconds'])
+            except ValueError as error:
+                raise CommandError(error)
+            for role, metrics in report.items():
+                self.stdout.write(
+                    f'{name:<11} {role:<6} {metrics["per_second"]:>9} оп/с  '
+                    f'p50 {metrics["p50_ms"]} ms  p99 {metrics["p99_ms"]} ms  '
+                    f'ошибок {metrics["errors"]}')
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replication import refresh_replicas
+
+
+class Command(BaseCommand):
+    help = 'Обновляет копии базы только для чтения (DATABASE_REPLICAS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Обновлять каждые N секунд, пока команду не остановят '
+                 f'(в проде {settings.REPLICA_REFRESH_INTERVAL})')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Копии не настроены: задайте SQLITE_REPLICAS')
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            refresh_replicas()
+            self.stdout.write(
+                f'Копий обновлено: {len(settings.DATABASE_REPLICAS)} за '
+                f'{time.monotonic() - started:.2f} с')
+            if interval is None:
+                return
+            time.sleep(max(0, interval - (time.monotonic() - started)))
@@ -0,0 +1,197 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит счетчики и гистограммы в памяти и раз в
+METRICS_FLUSH_INTERVAL секунд прибавляет их к общей SQLite-базе
+METRICS_DATABASE, так что /metrics показывает сумму по всем воркерам
+хоста. Запись в базу — один UPSERT на пачку, запрос к сайту только
+обновляет словарь в памяти.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, le)
+);
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HELP = {
+    'yatube_requests_total': ('counter', 'Запросы по view, методу и статусу'),
+    'yatube_request_duration_seconds': ('histogram', 'Время ответа view'),
+    'yatube_response_size_bytes': ('histogram', 'Размер тела ответа'),
+    'yatube_db_queries_total': ('counter', 'SQL-запросы'),
+    'yatube_db_query_seconds_total': ('counter', 'Время SQL-запросов'),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время рендера шаблонов и сериализации ответа'),
+    'yatube_cache_hits_total': ('counter', 'Попадания в кэш'),
+    'yatube_cache_misses_total': ('counter', 'Промахи кэша'),
+}
+
+_current = threading.local()
+
+
+@contextmanager
+def collect():
+    """Счетчики одного запроса, которые пополняет count()"""
+    _current.counters = defaultdict(float)
+    try:
+        yield _current.counters
+    finally:
+        _current.counters = None
+
+
+def count(name, amount=1):
+    """Счетчик текущего запроса; вне запроса ничего не делает"""
+    counters = getattr(_current, 'counters', None)
+    if counters is not None:
+        counters[name] += amount
+
+
+def labels_text(**labels):
+    return ','.join(f'{name}="{value}"'
+                    for name, value in sorted(labels.items()))
+
+
+class MetricsStore:
+    """Буфер метрик процесса и общая база всех процессов"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._pid = None
+        self._flushed = time.monotonic()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _check_fork(self):
+        # После fork не отправляем повторно накопленное родителем
+        if self._pid != os.getpid():
+            if self._pid is not None:
+                self._pending.clear()
+            self._pid = os.getpid()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._check_fork()
+            self._pending[name, labels, ''] += amount
+
+    def observe(self, name, labels, value, buckets):
+        le = next((str(bound) for bound in buckets if value <= bound), '+Inf')
+        with self._lock:
+            self._check_fork()
+            self._pending[name + '_bucket', labels, le] += 1
+            self._pending[name + '_sum', labels, ''] += value
+            self._pending[name + '_count', labels, ''] += 1
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 10)
+        if time.monotonic() - self._flushed >= interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = defaultdict(float)
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO samples (name, labels, le, value) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT (name, labels, le) '
+                'DO UPDATE SET value = value + excluded.value',
+                [(*key, value) for key, value in pending.items()])
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+    def samples(self):
+        self.flush()
+        connection = self._connect()
+        try:
+            return connection.execute(
+                'SELECT name, labels, le, value FROM samples '
+                'ORDER BY name, labels').fetchall()
+        finally:
+            connection.close()
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM samples')
+        finally:
+            connection.close()
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render(samples):
+    """Текстовый формат экспозиции Prometheus 0.0.4"""
+    families = defaultdict(list)
+    for name, labels, le, value in samples:
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in HELP:
+                family = name[:-len(suffix)]
+        families[family].append((name, labels, le, value))
+    lines = []
+    for family in sorted(families):
+        kind, description = HELP.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        buckets = defaultdict(dict)
+        for name, labels, le, value in families[family]:
+            if name.endswith('_bucket'):
+                buckets[labels][le] = value
+                continue
+            lines.append(f'{name}{{{labels}}} {_number(value)}')
+        for labels, counts in sorted(buckets.items()):
+            bounds = (LATENCY_BUCKETS if family.endswith('_seconds')
+                      else SIZE_BUCKETS)
+            total = 0
+            for le in [*(str(bound) for bound in bounds), '+Inf']:
+                total += counts.get(le, 0)
+                lines.append(f'{family}_bucket{{{labels},le="{le}"}} '
+                             f'{_number(total)}')
+    return '\n'.join(lines) + '\n'
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    path = settings.METRICS_DATABASE
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = MetricsStore(path)
+        return _store
@@ -0,0 +1,198 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+from django.views.generic import DetailView, ListView
+
+from core import auth, metrics, replication, routers, staticfiles
+from core.utils.query_audit import (QueryAudit, QueryBudgetExceeded,
+                                    get_view_budget)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryAuditMiddleware:
+    """Проверяет бюджет SQL-запросов view и ищет N+1.
+
+    QUERY_AUDIT = 'strict' — нарушение поднимает QueryBudgetExceeded
+    (так работают тесты, см. core.test_runner); 'log' — доля запросов
+    QUERY_AUDIT_SAMPLE_RATE проверяется, нарушения пишутся в лог;
+    'off' — проверка выключена.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'QUERY_AUDIT', 'off')
+        if mode == 'off' or (
+                mode == 'log' and random.random()
+                >= getattr(settings, 'QUERY_AUDIT_SAMPLE_RATE', 0.01)):
+            return self.get_response(request)
+        with QueryAudit() as audit:
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', None)
+        problems = audit.problems(budget) if budget is not None else None
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(
+                problems)
+            if mode == 'strict':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func, request.method)
+
+
+class MetricsMiddleware:
+    """Время ответа, SQL, рендер, кэш и размер ответа по view_name.
+
+    Ставится первым в MIDDLEWARE, чтобы время включало остальные
+    middleware. Значения копятся в процессе и сбрасываются в общую
+    базу core.metrics, откуда их отдает /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        started = time.perf_counter()
+        with metrics.collect() as counters, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(self._record_query))
+            response = self.get_response(request)
+        self._store(request, response, time.perf_counter() - started,
+                    counters)
+        return response
+
+    @staticmethod
+    def _record_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.count('db_queries')
+            metrics.count('db_seconds', time.perf_counter() - started)
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                metrics.count('render_seconds',
+                              time.perf_counter() - started)
+
+        response.render = timed_render
+        return response
+
+    @staticmethod
+    def _store(request, response, elapsed, counters):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        labels = metrics.labels_text(view=view)
+        store = metrics.get_store()
+        store.inc('yatube_requests_total', metrics.labels_text(
+            view=view, method=request.method, status=response.status_code))
+        store.observe('yatube_request_duration_seconds', labels, elapsed,
+                      metrics.LATENCY_BUCKETS)
+        if not response.streaming:
+            store.observe('yatube_response_size_bytes', labels,
+                          len(response.content), metrics.SIZE_BUCKETS)
+        for counter, name in (
+                ('db_queries', 'yatube_db_queries_total'),
+                ('db_seconds', 'yatube_db_query_seconds_total'),
+                ('render_seconds', 'yatube_template_render_seconds_total'),
+                ('cache_hits', 'yatube_cache_hits_total'),
+                ('cache_misses', 'yatube_cache_misses_total')):
+            store.inc(name, labels, counters.get(counter, 0))
+        store.maybe_flush()
+
+
+def reads_from_replica(view_func):
+    """ListView, DetailView и view с атрибутом replica_reads = True"""
+    view_class = getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return False
+    return getattr(view_class, 'replica_reads',
+                   issubclass(view_class, (ListView, DetailView)))
+
+
+class ReplicaMiddleware:
+    """Направляет чтения GET-запросов view-списков в копию базы.
+
+    После записи ответ ставит cookie REPLICA_STICKY_COOKIE на
+    REPLICA_MAX_LAG секунд: пока она есть, клиент читает основную базу
+    и видит свои изменения, например новый пост после редиректа
+    PostCreateView, даже если копии их еще не получили.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            return self.get_response(request)
+        with routers.request_scope() as scope:
+            response = self.get_response(request)
+        if scope.wrote:
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_MAX_LAG,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = routers.current_scope()
+        if (scope is None or request.method not in ('GET', 'HEAD')
+                or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+                or not reads_from_replica(view_func)):
+            return
+        replicas = replication.fresh_replicas()
+        if replicas:
+            scope.read_db = random.choice(replicas)
+            scope.read_snapshot = replication.snapshot_time(scope.read_db)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, которая берет request.user из кэша
+    (core/auth.py), а не из auth_user на каждый запрос"""
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: auth.get_user(request))
+
+
+class StaticFilesMiddleware:
+    """Отдает собранную collectstatic статику из STATIC_ROOT со сжатыми
+    копиями и immutable Cache-Control (core/staticfiles.py).
+
+    Работает при STATIC_PIPELINE = 'hashed', чтобы небольшой узел
+    обходился без отдельного веб-сервера для статики; запросы к
+    остальным путям и к отсутствующим файлам идут дальше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.files = staticfiles.StaticFiles(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        if (getattr(settings, 'STATIC_PIPELINE', 'off') != 'hashed'
+                or request.method not in ('GET', 'HEAD')):
+            return self.get_response(request)
+        name = staticfiles.static_name(request.path_info)
+        if name is None:
+            return self.get_response(request)
+        response = self.files.serve(request, name)
+        if response is None:
+            return self.get_response(request)
+        return response
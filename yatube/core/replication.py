@@ -0,0 +1,71 @@
+"""Копии основной SQLite-базы только для чтения.
+
+Пишущая транзакция SQLite блокирует читателей основного файла, поэтому
+ленты и карточки постов читаются из копий. Копия снимается online
+backup API (согласованный снимок без остановки записи) во временный
+файл и атомарно подменяет прежнюю через os.replace: открытые чтения
+дочитывают старый файл, новые соединения видят новый.
+
+Время изменения файла копии равно моменту снимка, по нему роутер
+отбрасывает копии старше REPLICA_MAX_LAG секунд — если команда
+refresh_replicas остановилась, чтение вернется на основную базу.
+
+    SQLITE_REPLICAS=2 python manage.py refresh_replicas --interval 5
+"""
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+
+
+def copy_database(source, target):
+    """Снимок соединения source в файл target, возвращает время снимка"""
+    temporary = f'{target}.{os.getpid()}.tmp'
+    started = time.time_ns()
+    copy = sqlite3.connect(temporary)
+    try:
+        source.backup(copy)
+        # Копии читаются с mode=ro, а WAL требует записываемого -shm
+        copy.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        copy.close()
+    os.utime(temporary, ns=(started, started))
+    os.replace(temporary, target)
+    return started / 10 ** 9
+
+
+def refresh_replica(source_path, target):
+    source = sqlite3.connect(source_path, timeout=5)
+    try:
+        return copy_database(source, target)
+    finally:
+        source.close()
+
+
+def refresh_replicas():
+    """Обновляет все копии из settings.DATABASE_REPLICAS"""
+    primary = settings.DATABASES['default']['NAME']
+    return {alias: refresh_replica(primary, path)
+            for alias, path in settings.DATABASE_REPLICAS.items()}
+
+
+def snapshot_time(alias):
+    """Момент снимка копии в наносекундах или None, если файла нет"""
+    try:
+        return os.stat(settings.DATABASE_REPLICAS[alias]).st_mtime_ns
+    except OSError:
+        return None
+
+
+def fresh_replicas():
+    """Алиасы копий, снятых не раньше чем REPLICA_MAX_LAG секунд назад"""
+    oldest = time.time() - settings.REPLICA_MAX_LAG
+    fresh = []
+    for alias, path in getattr(settings, 'DATABASE_REPLICAS', {}).items():
+        try:
+            if os.stat(path).st_mtime >= oldest:
+                fresh.append(alias)
+        except OSError:
+            continue
+    return fresh
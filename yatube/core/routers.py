@@ -0,0 +1,77 @@
+"""Роутер баз: запись в основную базу, чтение view-списков из копий.
+
+Копию для чтения выбирает ReplicaMiddleware на время одного запроса
+(см. core/replication.py); вне такого запроса и после первой записи в
+нем все запросы идут в основную базу.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+class RequestScope:
+    def __init__(self):
+        self.read_db = None
+        # Момент снимка копии read_db в наносекундах
+        self.read_snapshot = None
+        self.wrote = False
+
+
+@contextmanager
+def request_scope():
+    """Состояние маршрутизации на время запроса к сайту"""
+    _state.scope = RequestScope()
+    try:
+        yield _state.scope
+    finally:
+        _state.scope = None
+
+
+def current_scope():
+    return getattr(_state, 'scope', None)
+
+
+def reads_include(*versions):
+    """Видны ли чтениям запроса изменения, поднявшие версии versions
+    (core/utils/versions.py).
+
+    Копия, снятая раньше изменения, отдаст старые данные; положенный
+    под новыми версиями результат такого чтения остался бы в кэше и
+    после обновления копии.
+    """
+    scope = current_scope()
+    if scope is None or scope.read_db is None or scope.wrote:
+        return True
+    return (scope.read_snapshot is not None
+            and max(versions, default=0) <= scope.read_snapshot)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        scope = current_scope()
+        if scope is None or scope.wrote:
+            return None
+        return scope.read_db
+
+    def db_for_write(self, model, **hints):
+        scope = current_scope()
+        if scope is not None:
+            scope.wrote = True
+        # Явно: иначе Django пишет в базу, из которой прочитан объект
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,176 @@
+"""Статика с хэшами в именах и заранее сжатыми копиями.
+
+collectstatic с CompressedManifestStaticFilesStorage пишет в
+STATIC_ROOT файлы вида css/bootstrap.min.4f1e2c.css и рядом .gz и .br
+(brotli — если установлен пакет brotli). Имя меняется вместе с
+содержимым, поэтому такой файл кэшируется навсегда (immutable), а
+шаблоны через {% static %} сразу ссылаются на новое имя.
+
+StaticFilesMiddleware (core/middleware.py) отдает эти файлы без
+отдельного веб-сервера: выбирает сжатую копию по Accept-Encoding и не
+сжимает ничего во время запроса.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Картинки и шрифты уже сжаты, повторное сжатие их не уменьшит
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ico', '.json', '.map', '.txt',
+                '.html', '.xml')
+# Сжатая копия сохраняется, только если она меньше исходника хотя бы на 5%
+MIN_RATIO = 0.95
+# (Content-Encoding, суффикс файла) в порядке предпочтения
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _compressors():
+    compressors = {'.gz': lambda data: gzip.compress(
+        data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['.br'] = lambda data: brotli.compress(data)
+    return compressors
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, которая после хэширования кладет
+    рядом со сжимаемыми файлами копии .gz и .br"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+                continue
+            with self.open(name) as original:
+                data = original.read()
+            for suffix, compress in _compressors().items():
+                compressed = compress(data)
+                if len(compressed) > len(data) * MIN_RATIO:
+                    continue
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+                yield name, name + suffix, True
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().replace(' ', '')
+        if coding and quality not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFiles:
+    """Поиск и отдача файлов STATIC_ROOT.
+
+    Варианты файлов с хэшем в имени запоминаются: их содержимое не
+    меняется. Имена без хэша collectstatic перезаписывает, поэтому они
+    проверяются на диске при каждом запросе. Список хэшированных имен
+    перечитывается из манифеста, когда тот меняется.
+    """
+
+    def __init__(self, location):
+        self.root = os.path.realpath(location)
+        self.variants = {}
+        self.immutable = set()
+        self.manifest_mtime = None
+
+    def _load_manifest(self):
+        path = os.path.join(self.root,
+                            ManifestStaticFilesStorage.manifest_name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.manifest_mtime:
+            # Хранилище читает манифест из location при создании
+            storage = ManifestStaticFilesStorage(location=self.root)
+            self.immutable = set(storage.hashed_files.values())
+            self.variants.clear()
+            self.manifest_mtime = mtime
+
+    def find(self, name):
+        """(mtime исходника, {кодировка или None: путь}) либо None"""
+        if name in self.variants:
+            return self.variants[name]
+        self._load_manifest()
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(
+                path):
+            return None
+        found = {None: path}
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                found[encoding] = path + suffix
+        # Время изменения у всех копий одно — как у исходника
+        result = (os.stat(path).st_mtime, found)
+        if name in self.immutable:
+            self.variants[name] = result
+        return result
+
+    def serve(self, request, name):
+        """Ответ с файлом name или None, если такого файла нет"""
+        result = self.find(name)
+        if result is None:
+            return None
+        mtime, found = result
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next((encoding for encoding, _ in ENCODINGS
+                         if encoding in found and encoding in accepted),
+                        None)
+        path = found[encoding]
+        if not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                content = open(path, 'rb')
+            except OSError:
+                # Файл удален после collectstatic --clear
+                self.variants.pop(name, None)
+                return None
+            content_type, _ = mimetypes.guess_type(name)
+            response = FileResponse(
+                content, filename=posixpath.basename(name),
+                content_type=content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = (
+            IMMUTABLE if name in self.immutable
+            else f'public, max-age={settings.STATIC_MAX_AGE}')
+        if len(found) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def static_name(path):
+    """Имя файла внутри STATIC_ROOT для пути запроса или None"""
+    prefix = settings.STATIC_URL
+    if not prefix.startswith('/') or not path.startswith(prefix):
+        return None
+    name = posixpath.normpath(path[len(prefix):]).lstrip('/')
+    if not name or name.startswith('..'):
+        return None
+    return name
@@ -0,0 +1,139 @@
+"""Параллельные чтения и записи по копии базы в разных профилях.
+
+Для каждого профиля снимается свежая копия основной базы, читатели в
+отдельных процессах запрашивают первую страницу ленты, писатели
+добавляют комментарий и увеличивают счетчик поста — как CommentCreateView.
+Профиль 'default' открывает соединение на каждую операцию без PRAGMA
+(CONN_MAX_AGE = 0), 'production' держит соединение с
+SQLITE_PRODUCTION_PRAGMAS. Основная база не меняется.
+"""
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.database import apply_pragmas
+from core.replication import refresh_replica
+from posts.benchmark import percentile
+from posts.models import Comment, Post, User
+
+# Сколько секунд сверх длительности прогона ждать отчета процесса
+REPORT_GRACE = 30
+
+
+def profiles():
+    """{профиль: (PRAGMA, постоянное соединение)}"""
+    return {
+        'default': ({}, False),
+        'production': (settings.SQLITE_PRODUCTION_PRAGMAS, True),
+    }
+
+
+def _statements():
+    post, comment = Post._meta.db_table, Comment._meta.db_table
+    feed = (Post.objects.select_related('author', 'group')
+            .order_by('-pub_date', '-id')[:settings.AMOUNT_POSTS])
+    return {
+        'read': str(feed.query),
+        'comment': (f'INSERT INTO {comment} (post_id, author_id, text, '
+                    f'created, updated_at) VALUES (?, ?, ?, ?, ?)'),
+        'count': (f'UPDATE {post} SET comments_count = comments_count + 1, '
+                  f'updated_at = ? WHERE id = ?'),
+    }
+
+
+def _worker(path, role, pragmas, persistent, seconds, ids, statements,
+            results):
+    rng = random.Random()
+    post_ids, author_ids = ids
+    latencies, errors = [], 0
+    connection = None
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = sqlite3.connect(path, isolation_level=None)
+                    apply_pragmas(connection, pragmas)
+                if role == 'read':
+                    connection.execute(statements['read']).fetchall()
+                else:
+                    post_id = rng.choice(post_ids)
+                    now = str(timezone.now().replace(tzinfo=None))
+                    connection.execute(statements['comment'], [
+                        post_id, rng.choice(author_ids), 'Нагрузка', now,
+                        now])
+                    connection.execute(statements['count'], [now, post_id])
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.Error:
+                # Блокировки и сбои соединения — ошибки операции, а не
+                # повод завершить процесс
+                errors += 1
+            if not persistent and connection is not None:
+                connection.close()
+                connection = None
+    finally:
+        if connection is not None:
+            connection.close()
+        # Родитель ждет ответа каждого процесса, даже упавшего
+        results.put((role, latencies, errors))
+
+
+def run_profile(source, name, readers=4, writers=2, seconds=5):
+    pragmas, persistent = profiles()[name]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'stress.sqlite3')
+    try:
+        refresh_replica(source, path)
+        with sqlite3.connect(path) as connection:
+            ids = tuple(
+                [row[0] for row in connection.execute(
+                    f'SELECT id FROM {model._meta.db_table}')]
+                for model in (Post, User))
+        if not ids[0]:
+            raise ValueError('В базе нет постов: заполните ее seed_data')
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_worker, args=(
+                path, role, pragmas, persistent, seconds, ids,
+                _statements(), results))
+            for role in ['read'] * readers + ['write'] * writers]
+        for worker in workers:
+            worker.start()
+        try:
+            collected = [results.get(timeout=seconds + REPORT_GRACE)
+                         for _ in workers]
+        except queue.Empty:
+            # Процесс убит, не успев отчитаться
+            for worker in workers:
+                worker.terminate()
+            raise RuntimeError('Процесс нагрузки завершился без отчета')
+        finally:
+            for worker in workers:
+                worker.join()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(directory)
+    report = {}
+    for role in ('read', 'write'):
+        latencies = [value for kind, values, _ in collected if kind == role
+                     for value in values]
+        report[role] = {
+            'per_second': round(len(latencies) / seconds, 1),
+            'errors': sum(errors for kind, _, errors in collected
+                          if kind == role),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 3)
+            if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+            if latencies else None,
+        }
+    return report
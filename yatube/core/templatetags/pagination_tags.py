@@ -0,0 +1,14 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Текущий query string с заменой параметров пагинации (сохраняет ?q=)"""
+    query = context['request'].GET.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return f'?{query.urlencode()}'
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QueryAuditRunner(DiscoverRunner):
+    """Тесты падают, если view превысила бюджет запросов или сделала N+1.
+
+    Общий кэш и база метрик на время тестов — временные файлы: тесты
+    вызывают cache.clear() и пишут счетчики, рабочие файлы хоста
+    остаются нетронутыми.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_AUDIT = 'strict'
+        self.shared_files = tempfile.mkdtemp()
+        caches = {alias: {**config, 'LOCATION': os.path.join(
+                              self.shared_files, f'{alias}.sqlite3')}
+                  for alias, config in settings.CACHES.items()}
+        self.isolation = override_settings(
+            CACHES=caches,
+            METRICS_DATABASE=os.path.join(self.shared_files,
+                                          'metrics.sqlite3'))
+        self.isolation.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolation.disable()
+        shutil.rmtree(self.shared_files, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
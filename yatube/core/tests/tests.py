@@ -1,6 +1,26 @@
+import gzip
+import multiprocessing
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.templatetags.static import static
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import auth, metrics, replication, stress
+from core.cache.sqlite import SQLiteCache
+from core.utils.query_audit import QueryAudit
+from core.utils.query_plan import bad_steps, explain
+from posts.models import Post
 
 
 class TestsPagesErrors(TestCase):
@@ -20,3 +40,387 @@ class TestsPagesErrors(TestCase):
         """Тестируем, что page404 использует соответствующий html шаблон"""
         response = self.guest_user.get('http://127.0.0.1:8000/hhhkk')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def _incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_shared_between_instances(self):
+        """Тестируем, что запись видна другому экземпляру бэкенда"""
+        self._cache().set('key', {'answer': 42})
+        self.assertEqual(self._cache().get('key'), {'answer': 42})
+
+    def test_least_recently_used_evicted(self):
+        """Тестируем, что при переполнении вытесняется давно не читанное"""
+        cache = self._cache(MAX_ENTRIES=3, CULL_FREQUENCY=3,
+                            TOUCH_INTERVAL=0)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_incr_atomic_across_processes(self):
+        """Тестируем, что incr из разных процессов не теряет инкременты"""
+        self._cache().set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_incr_many,
+                                   args=(self.location, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self._cache().get('counter'), 200)
+
+    def test_hit_ratio_stats(self):
+        """Тестируем подсчет попаданий и промахов"""
+        cache = self._cache()
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('missing')
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+
+class QueryAuditTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = get_user_model().objects.create_user(username='audited')
+        Post.objects.bulk_create(
+            [Post(author=author, text=f'Пост {index}') for index in range(3)])
+
+    def test_detects_lazy_loads_and_duplicates(self):
+        """Проверяем, что N+1 и повторный запрос попадают в проблемы."""
+        with QueryAudit() as audit:
+            for post in Post.objects.all():
+                post.author.username
+        self.assertEqual(audit.count, 4)
+        self.assertEqual(audit.repeated_lazy_loads(), {'posts.Post.author': 3})
+        self.assertEqual(len(audit.duplicates()), 1)
+        self.assertEqual(len(audit.problems(budget=2)), 3)
+
+    def test_select_related_is_clean(self):
+        """Проверяем, что выборка со связями укладывается в один запрос."""
+        with QueryAudit() as audit:
+            for post in Post.objects.select_related('author'):
+                post.author.username
+        self.assertEqual(audit.problems(budget=1), [])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'metrics.sqlite3')
+        self.settings = override_settings(METRICS_DATABASE=path)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_metrics_endpoint_reports_views(self):
+        """Проверяем, что /metrics отдает счетчики и гистограммы view."""
+        client = Client()
+        client.get('/')
+        client.get('/')
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        text = response.content.decode()
+        self.assertIn('yatube_requests_total{method="GET",status="200",'
+                      'view="posts:index"} 2', text)
+        self.assertIn('yatube_request_duration_seconds_bucket'
+                      '{view="posts:index",le="+Inf"} 2', text)
+        self.assertIn('yatube_response_size_bytes_count'
+                      '{view="posts:index"} 2', text)
+        self.assertIn('yatube_cache_hits_total{view="posts:index"} ', text)
+
+    def test_samples_summed_across_workers(self):
+        """Проверяем, что буферы разных процессов складываются."""
+        path = os.path.join(self.directory, 'metrics.sqlite3')
+        for store in (metrics.MetricsStore(path), metrics.MetricsStore(path)):
+            store.inc('yatube_db_queries_total', 'view="x"', 3)
+            store.flush()
+        self.assertEqual(metrics.MetricsStore(path).samples(),
+                         [('yatube_db_queries_total', 'view="x"', '', 6.0)])
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_hidden_from_remote_hosts(self):
+        """Проверяем, что /metrics недоступен с чужих адресов."""
+        response = Client().get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_metrics_hidden_behind_proxy(self):
+        """Проверяем, что запрос через прокси не проходит по IP, а с
+        METRICS_TOKEN нужен заголовок Authorization."""
+        response = Client().get('/metrics', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(Client().get('/metrics').status_code,
+                             HTTPStatus.FORBIDDEN)
+            response = Client().get('/metrics',
+                                    HTTP_AUTHORIZATION='Bearer secret',
+                                    HTTP_X_FORWARDED_FOR='1.2.3.4')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create_user(username='cached')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        return response.wsgi_request.user, [
+            query['sql'] for query in captured.captured_queries
+            if '"auth_user"' in query['sql']]
+
+    def test_user_read_from_cache(self):
+        """Проверяем, что повторный запрос не читает auth_user."""
+        self.user_queries()
+        user, queries = self.user_queries()
+        self.assertEqual(user, self.user)
+        self.assertEqual(queries, [])
+
+    def test_changes_invalidate_cached_user(self):
+        """Проверяем, что сохранение пользователя сбрасывает кэш, а смена
+        пароля разлогинивает сессию."""
+        self.user_queries()
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.save()
+        self.assertEqual(self.user_queries()[0].first_name, 'Новое')
+        user.set_password('другой-пароль')
+        user.save()
+        # Сброс сессии — лишние запросы сверх бюджета страницы
+        with override_settings(QUERY_AUDIT='off'):
+            self.assertFalse(self.user_queries()[0].is_authenticated)
+
+    def test_logout_invalidates_cached_user(self):
+        """Проверяем, что выход удаляет пользователя из кэша."""
+        self.user_queries()
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(auth._key(self.user.pk)))
+
+    def test_bulk_deactivation_needs_forget(self):
+        """Проверяем, что после update() без сигналов forget() снимает
+        заблокированного пользователя из кэша."""
+        self.user_queries()
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False)
+        self.assertTrue(self.user_queries()[0].is_authenticated)
+        auth.forget(self.user.pk)
+        self.assertFalse(self.user_queries()[0].is_authenticated)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        """Проверяем, что сессия в подписанной cookie не читает базу."""
+        self.client.force_login(self.user)
+        self.user_queries()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertEqual(len(captured.captured_queries), 0)
+
+
+class QueryPlanTests(TestCase):
+    def test_feed_query_uses_index(self):
+        """Проверяем, что страница группы читается по составному индексу."""
+        sql = str(Post.objects.filter(group_id=1).order_by(
+            '-pub_date', '-id')[:11].query)
+        self.assertEqual(bad_steps(sql, explain(sql)), [])
+
+    def test_unindexed_sort_reported(self):
+        """Проверяем, что сортировка мимо индекса считается проблемой."""
+        sql = str(Post.objects.filter(group_id=1).order_by('text')[:11].query)
+        self.assertEqual(bad_steps(sql, explain(sql)),
+                         ['USE TEMP B-TREE FOR ORDER BY'])
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            STATIC_ROOT=self.directory, STATIC_PIPELINE='hashed',
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'))
+        self.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     ignore_patterns=['admin', 'rest_framework',
+                                      'debug_toolbar'])
+        self.url = static('css/bootstrap.min.css')
+        with open(os.path.join(settings.BASE_DIR, 'static', 'css',
+                               'bootstrap.min.css'), 'rb') as original:
+            self.content = original.read()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        """Проверяем, что collectstatic пишет имя с хэшем и копию .gz."""
+        self.assertRegex(self.url,
+                         r'^/static/css/bootstrap\.min\.\w{12}\.css$')
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, self.url[len('/static/'):]
+                         + '.gz')))
+        # PNG уже сжат
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'img', 'logo.png.gz')))
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        """Проверяем, что файл с хэшем отдается сжатым и навсегда."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            self.content)
+
+    def test_negotiation_and_revalidation(self):
+        """Проверяем отдачу без сжатия, имя без хэша и 304."""
+        response = self.client.get(self.url,
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get('/static/css/bootstrap.min.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get('/static/css/missing.css')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ReplicaTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'replica.sqlite3')
+        connections.databases['replica0'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f'file:{self.path}?mode=ro',
+        }
+        self.settings = override_settings(
+            DATABASE_REPLICAS={'replica0': self.path})
+        self.settings.enable()
+        self.user = get_user_model().objects.create(username='writer')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.settings.disable()
+        connections['replica0'].close()
+        del connections.databases['replica0']
+        del connections._connections.replica0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _copy(self):
+        connection.ensure_connection()
+        replication.copy_database(connection.connection, self.path)
+        # Тестовый клиент не закрывает соединения после запроса, а открытое
+        # соединение дочитывает подмененный файл
+        connections['replica0'].close()
+
+    def test_lists_read_replica_until_client_writes(self):
+        """Проверяем, что лента читается из копии, а после записи клиент
+        видит свой пост в основной базе."""
+        Post.objects.create(author=self.user, text='Из копии')
+        self._copy()
+        Post.objects.all().delete()
+        self.assertContains(self.client.get('/'), 'Из копии')
+
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Свежий пост'})
+        self.assertIn('primary_reads', response.cookies)
+        response = self.client.get('/')
+        self.assertContains(response, 'Свежий пост')
+        self.assertNotContains(response, 'Из копии')
+
+    def test_edit_not_cached_from_replica_before_refresh(self):
+        """Проверяем, что страница из копии, снятой до правки поста, не
+        остается в кэше после обновления копии."""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        self._copy()
+        post.text = 'Новый текст'
+        post.save()
+        anonymous = Client()
+        self.assertContains(anonymous.get('/'), 'Старый текст')
+
+        self._copy()
+        response = anonymous.get('/')
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+
+    def test_stale_replica_skipped(self):
+        """Проверяем, что копию старше REPLICA_MAX_LAG не читаем."""
+        self._copy()
+        os.utime(self.path, (0, 0))
+        self.assertEqual(replication.fresh_replicas(), [])
+        Post.objects.create(author=self.user, text='Только в основной')
+        self.assertContains(self.client.get('/'), 'Только в основной')
+
+
+class DatabaseTuningTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tuned.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL',
+                                       'synchronous': 'NORMAL',
+                                       'busy_timeout': 5000})
+    def test_pragmas_applied_to_new_connections(self):
+        """Проверяем, что новое соединение получает PRAGMA профиля."""
+        connections.databases['tuned'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path}
+        try:
+            with connections['tuned'].cursor() as cursor:
+                values = [cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                          for name in ('journal_mode', 'synchronous',
+                                       'busy_timeout')]
+        finally:
+            connections['tuned'].close()
+            del connections.databases['tuned']
+            del connections._connections.tuned
+        self.assertEqual(values, ['wal', 1, 5000])
+
+    def test_stress_reports_both_roles(self):
+        """Проверяем, что нагрузочный прогон считает чтения и записи."""
+        author = get_user_model().objects.create(username='author')
+        Post.objects.create(author=author, text='Текст')
+        connection.ensure_connection()
+        replication.copy_database(connection.connection, self.path)
+        report = stress.run_profile(self.path, 'production', readers=1,
+                                    writers=1, seconds=0.2)
+        self.assertGreater(report['read']['per_second'], 0)
+        self.assertGreater(report['write']['per_second'], 0)
+        self.assertEqual(report['write']['errors'], 0)
@@ -0,0 +1,73 @@
+"""Условные GET-запросы: ETag и Last-Modified до рендера.
+
+View описывает состояние страницы словарем из одного агрегатного
+запроса (время последнего изменения, число строк и т.п.). Если клиент
+или прокси прислал совпадающий If-None-Match или If-Modified-Since,
+ответ 304 уходит без рендера шаблона и сериализации.
+
+ETag слабый: токен CSRF в форме меняется от рендера к рендеру, а
+содержимое страницы — нет. В ETag входят путь с query string и
+пользователь, поэтому разные пользователи не получат чужую копию.
+Cache-Control: no-cache заставляет браузер и прокси переспрашивать
+сервер, а не держать страницу по эвристике Last-Modified.
+"""
+import hashlib
+from calendar import timegm
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_validators(request, state):
+    """(ETag, Last-Modified как timestamp) из словаря состояния"""
+    user = getattr(request, 'user', None)
+    raw = repr((request.get_full_path(), getattr(user, 'pk', None),
+                sorted(state.items())))
+    etag = f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+    modified = [value for value in state.values()
+                if isinstance(value, datetime)]
+    last_modified = (timegm(max(modified).utctimetuple())
+                     if modified else None)
+    return etag, last_modified
+
+
+def set_validators(response, request, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    user = getattr(request, 'user', None)
+    patch_cache_control(response, no_cache=True,
+                        private=bool(user and user.is_authenticated))
+    return response
+
+
+def conditional_response(request, state, respond):
+    """304 по состоянию state либо ответ respond() с валидаторами.
+
+    state=None — состояние не посчитать (страницы нет, нумерованная
+    пагинация), ответ строится как обычно.
+    """
+    if state is None or request.method not in ('GET', 'HEAD'):
+        return respond()
+    etag, last_modified = make_validators(request, state)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = respond()
+        if response.status_code != 200:
+            return response
+    return set_validators(response, request, etag, last_modified)
+
+
+class ConditionalGetMixin:
+    """GET с валидаторами из get_page_state() для CBV"""
+
+    def get_page_state(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request, self.get_page_state(),
+            lambda: super(ConditionalGetMixin, self).get(
+                request, *args, **kwargs))
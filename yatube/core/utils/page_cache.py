@@ -0,0 +1,80 @@
+"""Полностраничный кэш для анонимных посетителей.
+
+Ключ страницы включает путь с query string и текущие версии поколений,
+от которых страница зависит (см. core/utils/versions.py). Запись,
+меняющая данные страницы, поднимает поколение, и старые копии больше
+не читаются. Попадание отдает готовый ответ до вызова view: ни ORM, ни
+шаблоны не выполняются. Авторизованные пользователи кэш обходят.
+
+Вместе со страницей хранятся ее ETag и Last-Modified
+(core/utils/conditional.py): попадание с совпавшим If-None-Match
+отвечает 304.
+
+Ответ, прочитанный из копии базы, снятой раньше последнего изменения
+поколений, не кэшируется (core/routers.py).
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core import routers
+from core.utils.versions import get_versions
+
+CACHE_HEADER = 'X-Page-Cache'
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def _is_anonymous(request):
+    # Без cookie сессии проверка не обращается к базе
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def _page_key(request, versions):
+    raw = ':'.join([request.get_full_path(),
+                    *(str(version) for version in versions)])
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def anonymous_cache_page(generations, timeout=None):
+    """generations(request, **kwargs) возвращает имена поколений страницы"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not _is_anonymous(
+                    request):
+                return view(request, *args, **kwargs)
+            versions = get_versions(*generations(request, **kwargs))
+            key = _page_key(request, versions)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type, *headers = cached
+                response = HttpResponse(content, content_type=content_type)
+                for name, value in dict(*headers).items():
+                    response[name] = value
+                response[CACHE_HEADER] = 'hit'
+                return get_conditional_response(
+                    request, etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')),
+                    response=response)
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if (response.status_code == 200 and not response.streaming
+                    and routers.reads_include(*versions)):
+                cache.set(key, (response.content, response['Content-Type'],
+                                {name: response[name]
+                                 for name in STORED_HEADERS
+                                 if response.has_header(name)}),
+                          timeout or settings.PAGE_CACHE_TIMEOUT)
+                response[CACHE_HEADER] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -1,4 +1,13 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
 
 
 def pagination(request, object_list, amount_obj):
@@ -6,3 +15,191 @@ def pagination(request, object_list, amount_obj):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+class WindowPage(Page):
+    """Страница с окном номеров вокруг текущей страницы"""
+
+    @property
+    def page_window(self):
+        side = getattr(settings, 'PAGINATION_WINDOW', 2)
+        first = max(1, self.number - side)
+        last = min(self.paginator.num_pages, self.number + side)
+        return range(first, last + 1)
+
+
+class WindowPaginator(Paginator):
+    """Нумерованная пагинация, отдающая только окно ссылок"""
+    is_cursor = False
+
+    def _get_page(self, *args, **kwargs):
+        return WindowPage(*args, **kwargs)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'v': values},
+                         separators=(',', ':'))
+    token = base64.urlsafe_b64encode(payload.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, значения) или None для битого токена"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['v']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+    if direction not in ('n', 'p') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class CursorPage:
+    """Страница курсорной пагинации с токенами соседних страниц"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Каждая страница — один запрос вида
+    WHERE (pub_date, id) < (:pub_date, :id) ORDER BY pub_date DESC, id DESC
+    LIMIT per_page + 1, поэтому глубокие страницы не дороже первой.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _position(self, obj):
+        return [self._field(name).value_to_string(obj)
+                for name in self.fields]
+
+    def _load_position(self, cursor):
+        position = decode_cursor(cursor)
+        if position is None or len(position[1]) != len(self.fields):
+            return None
+        direction, raw_values = position
+        try:
+            values = [self._field(name).to_python(value)
+                      for name, value in zip(self.fields, raw_values)]
+        except (ValidationError, TypeError):
+            return None
+        if None in values:
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после позиции» для лексикографического ключа"""
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            descending = self.ordering[index].startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_name, prev_value in zip(self.fields[:index],
+                                             values[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _reverse(ordering):
+        return [name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering]
+
+    def _window(self, position):
+        queryset = self.object_list
+        limit = self.per_page + 1
+        if position is None or position[0] == 'n':
+            if position is not None:
+                queryset = queryset.filter(self._seek(position[1], True))
+            return queryset.order_by(*self.ordering)[:limit]
+        queryset = queryset.filter(self._seek(position[1], False))
+        return queryset.order_by(*self._reverse(self.ordering))[:limit]
+
+    def window(self, cursor=None):
+        """Невыполненный запрос строк страницы (с одной лишней строкой)"""
+        return self._window(self._load_position(cursor))
+
+    def page(self, cursor=None):
+        """Страница после/до позиции из токена; битый токен — первая"""
+        position = self._load_position(cursor)
+        rows = list(self._window(position))
+        has_more = len(rows) > self.per_page
+        if position is None or position[0] == 'n':
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, position is not None
+        else:
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, has_more
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor('n', self._position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor('p', self._position(rows[0]))
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class FeedPaginationMixin:
+    """Пагинация лент: курсорная по умолчанию, нумерованная по настройке.
+
+    FEED_PAGINATION = 'numbered' возвращает классические ?page=N ссылки
+    для небольших инсталляций.
+    """
+    paginator_class = WindowPaginator
+    cursor_ordering = ('-pub_date', '-id')
+
+    def use_cursor_pagination(self):
+        return getattr(settings, 'FEED_PAGINATION', 'cursor') == 'cursor'
+
+    def cursor_window(self, queryset):
+        """Строки текущей страницы без выполнения запроса; None при
+        нумерованной пагинации"""
+        if not self.use_cursor_pagination():
+            return None
+        paginator = CursorPaginator(queryset, self.get_paginate_by(queryset),
+                                    ordering=self.cursor_ordering)
+        return paginator.window(self.request.GET.get(CURSOR_PARAM))
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size,
+                                    ordering=self.cursor_ordering)
+        page = paginator.page(self.request.GET.get(CURSOR_PARAM))
+        return paginator, page, page.object_list, page.has_other_pages()
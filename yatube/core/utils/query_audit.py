@@ -0,0 +1,128 @@
+"""Учет SQL-запросов одного запроса к сайту: бюджет и поиск N+1.
+
+QueryAudit перехватывает запросы всех соединений через execute_wrapper
+и ленивые загрузки внешних ключей (post.author без select_related).
+Проблемами считаются:
+
+* одинаковый SQL с одинаковыми параметрами, выполненный больше раза;
+* одна и та же связь, лениво загруженная больше раза — признак N+1;
+* превышение бюджета view (атрибут query_budget класса view).
+
+Проверяются только view с объявленным бюджетом: сторонние view
+(админка, django.contrib.auth) остаются как есть.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.models.fields.related_descriptors import \
+    ForwardManyToOneDescriptor
+
+# Служебные команды транзакций не считаем запросами view
+SERVICE_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+# Промахи кэша миниатюр sorl-thumbnail: при первом рендере картинки ключи
+# читаются и пишутся в БД, в проде миниатюры заранее строит
+# posts.thumbnails, поэтому в бюджет view такие запросы не входят
+EXEMPT_TABLES = ('"thumbnail_kvstore"',)
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_original_get_object = None
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос превысил бюджет или выполнил повторные запросы"""
+
+
+def _get_object(descriptor, instance):
+    audit = getattr(_state, 'audit', None)
+    if audit is not None:
+        field = descriptor.field
+        audit.lazy_loads[f'{field.model._meta.label}.{field.name}'] += 1
+    return _original_get_object(descriptor, instance)
+
+
+def _install_lazy_load_hook():
+    global _original_get_object
+    with _install_lock:
+        if _original_get_object is None:
+            _original_get_object = ForwardManyToOneDescriptor.get_object
+            ForwardManyToOneDescriptor.get_object = _get_object
+
+
+def get_view_budget(view_func, method):
+    """Бюджет из query_budget класса view (CBV или DRF) либо функции.
+
+    query_budget — число или словарь по HTTP-методам:
+    query_budget = {'GET': 3, 'POST': 9}.
+    """
+    for owner in (getattr(view_func, 'view_class', None),
+                  getattr(view_func, 'cls', None), view_func):
+        budget = getattr(owner, 'query_budget', None)
+        if isinstance(budget, dict):
+            return budget.get(method)
+        if budget is not None:
+            return budget
+    return None
+
+
+class QueryAudit:
+    """with QueryAudit() as audit: ...; audit.problems(budget)"""
+
+    def __init__(self):
+        self.queries = []
+        self.lazy_loads = Counter()
+        self._stack = None
+
+    def __enter__(self):
+        _install_lazy_load_hook()
+        self._previous = getattr(_state, 'audit', None)
+        _state.audit = self
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        _state.audit = self._previous
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not (sql.lstrip().upper().startswith(SERVICE_PREFIXES)
+                    or any(table in sql for table in EXEMPT_TABLES)):
+                self.queries.append(
+                    (sql, repr(params), time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        repeated = Counter((sql, params) for sql, params, _ in self.queries)
+        return {sql: times for (sql, _), times in repeated.items()
+                if times > 1}
+
+    def repeated_lazy_loads(self):
+        return {relation: times for relation, times in self.lazy_loads.items()
+                if times > 1}
+
+    def problems(self, budget=None):
+        """Описания проблем; пустой список — запрос в порядке"""
+        found = []
+        if budget is not None and self.count > budget:
+            found.append(f'{self.count} SQL-запросов при бюджете {budget}')
+        for sql, times in self.duplicates().items():
+            found.append(f'{times}× одинаковый запрос: {sql[:200]}')
+        for relation, times in self.repeated_lazy_loads().items():
+            found.append(f'{times}× ленивая загрузка {relation} (N+1)')
+        return found
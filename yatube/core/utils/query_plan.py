@@ -0,0 +1,62 @@
+"""Проверка планов запросов SQLite через EXPLAIN QUERY PLAN.
+
+Плохими считаются шаги плана, которые:
+
+* досортировывают строки во временном B-дереве
+  (USE TEMP B-TREE FOR ORDER BY / GROUP BY / DISTINCT);
+* читают таблицу целиком (SCAN <таблица>). Полный проход по индексу
+  допустим только для запроса без WHERE с LIMIT — это чтение начала
+  ленты в порядке индекса, а не поиск нужных строк перебором. Для
+  таблицы из подзапроса (... IN (SELECT ... LIMIT 11)) проверяется
+  текст подзапроса.
+"""
+import re
+
+from django.db import connections
+
+INDEX_SCANS = ('USING INDEX', 'USING COVERING INDEX')
+
+
+def explain(sql, params=None, using='default'):
+    """Строки detail плана запроса"""
+    with connections[using].cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _ordered_head(sql):
+    return (re.search(r'\bLIMIT\b', sql) is not None
+            and re.search(r'\bWHERE\b', sql) is None)
+
+
+def _scope(sql, alias):
+    """Подзапрос без вложенных скобок, читающий alias, иначе весь SQL"""
+    match = re.search(rf'\(SELECT [^()]*\b{re.escape(alias)}\b[^()]*\)', sql)
+    return match.group(0) if match else sql
+
+
+def bad_steps(sql, plan, allow_scans=()):
+    """allow_scans — таблицы, которые читаются целиком намеренно"""
+    bad = []
+    for step in plan:
+        if 'TEMP B-TREE' in step:
+            bad.append(step)
+        elif (step.startswith('SCAN ') and 'CONSTANT ROW' not in step
+                and step.split()[1] not in allow_scans
+                and not (any(scan in step for scan in INDEX_SCANS)
+                         and _ordered_head(_scope(sql, step.split()[1])))):
+            bad.append(step)
+    return bad
+
+
+def plan_problems(queries, allow_scans=(), using='default'):
+    """[(sql, плохие шаги)] для SELECT из captured_queries"""
+    problems = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        steps = bad_steps(sql, explain(sql, using=using), allow_scans)
+        if steps:
+            problems.append((sql, steps))
+    return problems
@@ -0,0 +1,44 @@
+"""Счетчики версий в кэше для инвалидации без сброса всего кэша.
+
+Ключи фрагментов и страниц включают текущие версии своих зависимостей;
+после bump() старые записи просто перестают читаться и вытесняются
+сами. Версия — время последнего изменения в наносекундах: так после
+вытеснения счетчика старые ключи не воскресают, а по версии видно,
+попало ли изменение в снимок копии базы (core/routers.py).
+"""
+import time
+
+from django.core.cache import cache
+
+PREFIX = 'version'
+
+
+def _key(name):
+    return f'{PREFIX}:{name}'
+
+
+def get_versions(*names):
+    """Текущие версии в порядке names одним обращением к кэшу"""
+    keys = [_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            # add не перетирает версию, которую успел записать другой процесс
+            if not cache.add(key, value, timeout=None):
+                missing[key] = cache.get(key, value)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*names):
+    cache.set_many({_key(name): time.time_ns() for name in names},
+                   timeout=None)
+
+
+def incr_counter(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
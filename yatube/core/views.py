@@ -1,6 +1,12 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core import metrics
 
 
 def page_not_found(request, exception):
@@ -19,3 +25,27 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request):
+    """С METRICS_TOKEN — только с заголовком Authorization: Bearer <token>;
+    без него — только прямые запросы с METRICS_ALLOWED_IPS. Запрос через
+    обратный прокси приходит с его адреса, поэтому X-Forwarded-For и
+    Forwarded означают чужого клиента"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    if ('HTTP_X_FORWARDED_FOR' in request.META
+            or 'HTTP_FORWARDED' in request.META):
+        return False
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Метрики всех воркеров хоста для Prometheus"""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(metrics.render(metrics.get_store().samples()),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
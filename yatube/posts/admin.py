@@ -29,4 +29,4 @@ class FollowAdmin(admin.ModelAdmin):
 
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
-    list_display = ('post', 'user', 'like',)
\ No newline at end of file
+    list_display = ('post', 'user', 'like', 'created')
\ No newline at end of file
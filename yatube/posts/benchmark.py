@@ -0,0 +1,173 @@
+"""Замер именованных маршрутов posts и api на синтетических данных.
+
+Для каждого размера набора данных создается чистая тестовая база,
+seeding.seed() заполняет ее, и каждый маршрут из пространств имен
+NAMESPACES запрашивается тестовым клиентом. Для маршрута фиксируются
+перцентили задержки и число SQL-запросов; результат можно сохранить
+как базовую линию и сравнивать с ней следующие прогоны.
+"""
+import json
+import shutil
+import tempfile
+import time
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               teardown_databases)
+from django.urls import get_resolver, reverse
+
+from posts import seeding
+from posts.models import Follow, Group, Post, User
+
+NAMESPACES = ('posts', 'api_posts')
+# Маршруты, у которых нет GET-представления
+SKIP_ROUTES = {'posts:add_comment', 'posts:post_like_toggle'}
+# GET этих маршрутов меняет данные: повторы замера подписывали бы и
+# отписывали пользователя, и следующие маршруты мерились бы на другом
+# наборе данных
+MUTATING_ROUTES = {'posts:profile_follow', 'posts:profile_unfollow',
+                   'posts:post_like', 'posts:post_unlike'}
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def route_names():
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        namespace_resolver = resolver.namespace_dict[namespace][1]
+        for name in sorted(key for key in namespace_resolver.reverse_dict
+                           if isinstance(key, str)):
+            route = f'{namespace}:{name}'
+            if route not in SKIP_ROUTES:
+                params = min(
+                    (set(params) for possibility, *_ in
+                     namespace_resolver.reverse_dict.getlist(name)
+                     for _, params in possibility),
+                    key=len)
+                yield route, params
+
+
+def sample_kwargs(user):
+    """Значения параметров маршрутов из засеянных данных"""
+    post = Post.objects.order_by('-likes_count').first()
+    author = (Follow.objects.filter(user=user).select_related('author')
+              .first())
+    author = author.author if author else post.author
+    group = Group.objects.order_by('id').first()
+    return {
+        'post_id': post.id, 'pk': post.id,
+        'slug': group.slug if group else '',
+        'username': author.username,
+        'kind': 'posts', 'export_format': 'ndjson',
+    }
+
+
+def time_route(client, url, repeat):
+    client.get(url)
+    durations, queries, status = [], 0, None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            durations.append((time.perf_counter() - started) * 1000)
+        queries = len(captured.captured_queries)
+        status = response.status_code
+    return {
+        'status': status,
+        'queries': queries,
+        'p50_ms': round(percentile(durations, 0.5), 3),
+        'p90_ms': round(percentile(durations, 0.9), 3),
+        'p99_ms': round(percentile(durations, 0.99), 3),
+    }
+
+
+def run(sizes, repeat=20, stdout=None):
+    """Результаты {размер: {маршрут: метрики}}; размер — число постов"""
+    results = {}
+    # Картинки засеянных постов; удаляются вместе с каталогом
+    media_root = tempfile.mkdtemp()
+    try:
+        with override_settings(CACHES=BENCHMARK_CACHES,
+                               MEDIA_ROOT=media_root, DEBUG=False):
+            for size in sizes:
+                results[str(size)] = _run_size(size, repeat, stdout)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    return results
+
+
+def _run_size(size, repeat, stdout):
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seeding.seed(
+            users=max(10, size // 10),
+            groups=max(1, size // 100), posts=size,
+            comments=size * 2, likes=size * 5, random_seed=size)
+        user = User.objects.order_by('-stats__following_count')[0]
+        user.is_staff = True
+        user.save()
+        client = Client()
+        client.force_login(user)
+        kwargs = sample_kwargs(user)
+        results = {}
+        for route, params in route_names():
+            if route in MUTATING_ROUTES:
+                continue
+            url = reverse(route, kwargs={
+                param: kwargs[param] for param in params})
+            metrics = time_route(client, url, repeat)
+            results[route] = metrics
+            if stdout is not None:
+                stdout.write(
+                    f'{size:>7} {route:<28} '
+                    f'p50 {metrics["p50_ms"]:>8.2f} ms  '
+                    f'p99 {metrics["p99_ms"]:>8.2f} ms  '
+                    f'SQL {metrics["queries"]:>3}  '
+                    f'HTTP {metrics["status"]}')
+        return results
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def compare(results, baseline, tolerance=0.25, noise_ms=1.0):
+    """Список регрессий относительно базовой линии: медленнее больше чем
+    на tolerance (и на noise_ms) или больше SQL-запросов"""
+    regressions = []
+    for size, routes in results.items():
+        for route, metrics in routes.items():
+            before = baseline.get(size, {}).get(route)
+            if before is None:
+                continue
+            if metrics['queries'] > before['queries']:
+                regressions.append(
+                    f'{size} {route}: SQL {before["queries"]} → '
+                    f'{metrics["queries"]}')
+            slower = metrics['p50_ms'] - before['p50_ms']
+            if slower > noise_ms and slower > before['p50_ms'] * tolerance:
+                regressions.append(
+                    f'{size} {route}: p50 {before["p50_ms"]} → '
+                    f'{metrics["p50_ms"]} ms')
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as target:
+        json.dump(results, target, ensure_ascii=False, indent=2,
+                  sort_keys=True)
@@ -0,0 +1,62 @@
+"""Состояние страниц с постами для ETag и Last-Modified.
+
+Каждая функция — один запрос к базе, см. core/utils/conditional.py.
+Лайки и комментарии меняют Post.updated_at вместе со счетчиками
+(posts/counters.py), поэтому отдельно не читаются. У модели
+пользователя нет времени изменения, поэтому правку автора выдают
+версии author:<id> из кэша (posts/signals.py) — одно обращение к кэшу
+без запроса к базе.
+"""
+from datetime import datetime, timezone
+
+from django.db.models import Max
+
+from core.utils.versions import get_versions
+from posts.models import Post
+
+
+def _author_state(author_ids):
+    """Версии авторов и время последней правки среди них"""
+    author_ids = sorted(author_ids)
+    author_versions = get_versions(*(f'author:{author_id}'
+                                     for author_id in author_ids))
+    return {
+        'authors': tuple(zip(author_ids, author_versions)),
+        # Версия — время правки в наносекундах (core/utils/versions.py)
+        'authors_modified': (
+            datetime.fromtimestamp(max(author_versions) / 1e9,
+                                   tz=timezone.utc)
+            if author_versions else None),
+    }
+
+
+def feed_state(post_ids):
+    """Страница ленты; post_ids — подзапрос id постов окна страницы.
+
+    Число и сумма id меняются, когда пост уходит из окна или приходит в
+    него, время изменения — когда меняется пост, его группа или автор.
+    """
+    rows = list(Post.objects.filter(pk__in=post_ids).order_by().values_list(
+        'id', 'author_id', 'updated_at', 'group__updated_at'))
+    groups_modified = [row[3] for row in rows if row[3] is not None]
+    return {
+        'posts': len(rows),
+        'ids': sum(row[0] for row in rows) if rows else None,
+        'modified': max((row[2] for row in rows), default=None),
+        'groups_modified': max(groups_modified, default=None),
+        **_author_state({row[1] for row in rows}),
+    }
+
+
+def post_state(post_id):
+    """Страница поста с комментариями; None, если поста нет"""
+    state = Post.objects.filter(pk=post_id).aggregate(
+        modified=Max('updated_at'),
+        group_modified=Max('group__updated_at'),
+        author=Max('author_id'),
+        author_posts=Max('author__stats__posts_count'),
+        comments_modified=Max('comments__updated_at'))
+    if state['modified'] is None:
+        return None
+    state.update(_author_state([state.pop('author')]))
+    return state
@@ -0,0 +1,127 @@
+"""Денормализованные счетчики лайков, комментариев, постов и подписок.
+
+Все изменения — атомарные UPDATE ... SET x = x + 1 через F(), поэтому
+параллельные записи не теряют инкременты. Разошедшиеся значения
+пересчитывает команда reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from posts.models import AuthorStats, Comment, Follow, Like, Post, User
+
+
+def _apply(queryset, deltas, **values):
+    return queryset.update(
+        **values,
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def bump_post(post_id, **deltas):
+    """bump_post(post.id, likes_count=1)"""
+    # update() не трогает auto_now, а счетчики видны на странице поста
+    _apply(Post.objects.filter(pk=post_id), deltas,
+           updated_at=timezone.now())
+
+
+def bump_author(user_id, **deltas):
+    """bump_author(user.id, followers_count=-1)"""
+    stats = AuthorStats.objects.filter(pk=user_id)
+    if any(delta < 0 for delta in deltas.values()):
+        # Уменьшение не создает запись: при каскадном удалении
+        # пользователя его AuthorStats удаляются раньше постов и подписок.
+        # Ноль — нижняя граница, даже если счетчик уже разошелся
+        stats.update(**{field: Greatest(F(field) + delta, Value(0))
+                        for field, delta in deltas.items()})
+        return
+    if not _apply(stats, deltas):
+        _, created = AuthorStats.objects.get_or_create(
+            user_id=user_id,
+            defaults={field: max(0, delta)
+                      for field, delta in deltas.items()})
+        if not created:
+            _apply(stats, deltas)
+
+
+def author_stats(user):
+    """Счетчики пользователя, при необходимости создает пустую запись"""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats.objects.get_or_create(user=user)[0]
+
+
+def _count(model, field):
+    """Подзапрос COUNT(*) по внешнему ключу field = OuterRef('pk')"""
+    counted = (model.objects.filter(**{field: OuterRef('pk')})
+               .order_by().values(field).annotate(total=Count('pk'))
+               .values('total'))
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def _chunks(queryset, chunk_size, pks=None):
+    """Строки queryset пачками по pk; pks ограничивает выборку"""
+    if pks is not None:
+        pks = sorted(pks)
+        for start in range(0, len(pks), chunk_size):
+            yield list(queryset.filter(
+                pk__in=pks[start:start + chunk_size]).order_by('pk'))
+        return
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]['pk']
+
+
+def reconcile_posts(chunk_size=500, post_ids=None):
+    """Пересчитывает likes_count/comments_count всех постов или только
+    post_ids; возвращает число исправленных постов"""
+    actual = Post.objects.values(
+        'pk', 'likes_count', 'comments_count').annotate(
+        real_likes=_count(Like, 'post'),
+        real_comments=_count(Comment, 'post'))
+    fixed = 0
+    for chunk in _chunks(actual, chunk_size, post_ids):
+        for row in chunk:
+            if (row['likes_count'], row['comments_count']) != (
+                    row['real_likes'], row['real_comments']):
+                Post.objects.filter(pk=row['pk']).update(
+                    likes_count=row['real_likes'],
+                    comments_count=row['real_comments'],
+                    updated_at=timezone.now())
+                fixed += 1
+    return fixed
+
+
+def reconcile_authors(chunk_size=500, user_ids=None):
+    """Пересчитывает AuthorStats всех пользователей или только user_ids,
+    создавая недостающие записи; возвращает число исправленных
+    пользователей"""
+    actual = User.objects.values('pk').annotate(
+        real_posts=_count(Post, 'author'),
+        real_followers=_count(Follow, 'author'),
+        real_following=_count(Follow, 'user'))
+    fixed = 0
+    for chunk in _chunks(actual, chunk_size, user_ids):
+        stored = AuthorStats.objects.in_bulk([row['pk'] for row in chunk])
+        for row in chunk:
+            real = (row['real_posts'], row['real_followers'],
+                    row['real_following'])
+            stats = stored.get(row['pk'])
+            if stats is not None and real == (
+                    stats.posts_count, stats.followers_count,
+                    stats.following_count):
+                continue
+            AuthorStats.objects.update_or_create(
+                user_id=row['pk'],
+                defaults={'posts_count': real[0],
+                          'followers_count': real[1],
+                          'following_count': real[2]})
+            fixed += 1
+    return fixed
@@ -0,0 +1,71 @@
+"""Потоковая выгрузка постов, комментариев и лайков в NDJSON или CSV.
+
+Строки читаются QuerySet.iterator() пачками по id, поэтому память не
+растет с размером таблицы. Каждая строка содержит id: повторный запуск
+с since_id = последний полученный id продолжает выгрузку с места
+обрыва, since ограничивает выгрузку по дате создания.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Comment, Like, Post
+
+EXPORTS = {
+    'posts': (Post, 'pub_date',
+              ('id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+               'likes_count', 'comments_count')),
+    'comments': (Comment, 'created',
+                 ('id', 'post_id', 'author_id', 'text', 'created')),
+    'likes': (Like, 'created',
+              ('id', 'post_id', 'user_id', 'like', 'created')),
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_fields(kind):
+    return EXPORTS[kind][2]
+
+
+def iter_rows(kind, since_id=None, since=None, chunk_size=2000):
+    """Строки выгрузки kind в порядке id, начиная после since_id"""
+    model, date_field, fields = EXPORTS[kind]
+    queryset = model.objects.order_by('id')
+    if since_id is not None:
+        queryset = queryset.filter(id__gt=since_id)
+    if since is not None:
+        if date_field is None:
+            raise ValueError(f'У выгрузки {kind} нет даты создания')
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def ndjson_lines(rows, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку, не копит"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields, header=True):
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def format_rows(rows, fields, export_format, header=True):
+    """Генератор строк выгрузки в формате ndjson или csv"""
+    if export_format == 'csv':
+        return csv_lines(rows, fields, header)
+    return ndjson_lines(rows, fields)
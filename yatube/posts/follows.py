@@ -0,0 +1,48 @@
+"""Граф подписок: идемпотентные подписка и отписка и пакетная проверка.
+
+Пара (user, author) уникальна в базе, поэтому повторная подписка не
+создает дубль даже при параллельных запросах, а IntegrityError значит
+«уже подписан». Индекс (user, author) обслуживает ленту и проверки,
+(author, user) — выборку подписчиков автора.
+"""
+from django.db import IntegrityError, transaction
+
+from posts.models import Follow
+
+
+def follow(user, author):
+    """True, если подписка создана этим вызовом; на себя не подписывает"""
+    if user.pk == author.pk:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """True, если подписка удалена этим вызовом"""
+    # Сигналы удаления читают user и author: удаляем загруженные объекты
+    deleted = False
+    for subscription in Follow.objects.filter(
+            user=user, author=author).select_related('user', 'author'):
+        subscription.delete()
+        deleted = True
+    return deleted
+
+
+def is_following(user, author):
+    if not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author=author).exists()
+
+
+def followed_authors(user, usernames):
+    """Какие из авторов user читает — одним запросом по индексу"""
+    if not user.is_authenticated or not usernames:
+        return set()
+    return set(Follow.objects.filter(
+        user=user, author__username__in=usernames).values_list(
+        'author__username', flat=True))
@@ -0,0 +1,27 @@
+"""Поколения полностраничного кэша публичных лент.
+
+Поколение — счетчик версий (core/utils/versions.py); страница кэшируется
+под текущими значениями своих поколений, запись поднимает нужные.
+"""
+EVERYTHING = 'page:all'
+FEED = 'page:feed'
+
+
+def group(slug):
+    return f'page:group:{slug}'
+
+
+def author(username):
+    return f'page:author:{username}'
+
+
+def index_page(request):
+    return [EVERYTHING, FEED]
+
+
+def group_page(request, slug):
+    return [EVERYTHING, group(slug)]
+
+
+def profile_page(request, username):
+    return [EVERYTHING, author(username)]
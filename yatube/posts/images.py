@@ -0,0 +1,81 @@
+"""Обработка загруженных картинок постов.
+
+При сохранении поста картинка очищается от метаданных (EXIF, GPS),
+поворачивается по EXIF-ориентации, а ее размеры сохраняются в
+image_width/image_height: по ним шаблон задает width и height картинки
+карточки, не открывая файл. После загрузки строятся уменьшенные
+варианты WebP/JPEG с обрезкой под пропорции карточки для атрибута
+srcset.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def strip_metadata(uploaded):
+    """Возвращает (ContentFile без метаданных, ширина, высота)"""
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    image_format = image.format
+    if getattr(image, 'is_animated', False):
+        # Анимацию не перекодируем, чтобы не потерять кадры
+        uploaded.seek(0)
+        return ContentFile(uploaded.read()), image.width, image.height
+    image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=90)
+    return ContentFile(buffer.getvalue()), image.width, image.height
+
+
+def variant_name(name, width, extension):
+    """Имя варианта включает расширение оригинала: photo.jpg и photo.png
+    из одного каталога загрузки не должны делить варианты"""
+    return f'posts/variants/{os.path.basename(name)}-{width}.{extension}'
+
+
+def variant_url(name, width, extension):
+    return default_storage.url(variant_name(name, width, extension))
+
+
+def card_height(width):
+    """Высота картинки шириной width, обрезанной под пропорции карточки"""
+    ratio_width, ratio_height = settings.POST_IMAGE_ASPECT
+    return max(1, round(width * ratio_height / ratio_width))
+
+
+def _crop_to_aspect(image):
+    return ImageOps.fit(image, (image.width, card_height(image.width)),
+                        method=Image.LANCZOS)
+
+
+def make_variants(name):
+    """Строит варианты для ширин из POST_IMAGE_VARIANT_WIDTHS, не
+    превышающих оригинал; возвращает (ширина, высота, ширины вариантов)"""
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image.load()
+    original_size = image.size
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image = _crop_to_aspect(image)
+    widths = [width for width in settings.POST_IMAGE_VARIANT_WIDTHS
+              if width <= image.width]
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, image_format in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, quality=80)
+            target = variant_name(name, width, extension)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    return original_size[0], original_size[1], widths
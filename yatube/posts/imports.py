@@ -0,0 +1,223 @@
+"""Массовая загрузка постов, комментариев и подписок из JSONL.
+
+Строки читаются потоком и копятся пачками; авторы и группы
+разрешаются через словари username → id и slug → id, которые
+дозаполняются одним запросом на пачку. Вставка — bulk_create в одной
+транзакции на пачку, поэтому сигналы моделей не вызываются: счетчики,
+«Популярное», поисковый индекс, ленты подписок и поколения кэша
+приводятся в порядок в refresh_derived_data() для строк пачки в той же
+транзакции — точка продолжения не обгоняет производные данные.
+
+Форматы строк:
+    posts:    {"text", "author", "group"?, "pub_date"?, "image"?, "id"?}
+    comments: {"post", "author", "text", "created"?, "id"?}
+    follows:  {"user", "author"}
+"""
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.utils import versions
+from posts import counters, generations, search, timeline, trending
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+DATE_FIELDS = {Post: 'pub_date', Comment: 'created', Like: 'created'}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def bulk_insert(model, objects, keep_dates=False, batch_size=None):
+    """bulk_create, возвращающий id вставленных строк.
+
+    Django 2.2 не получает из SQLite id после bulk_create, поэтому новые
+    id — это id больше прежнего максимума: до чтения максимума транзакция
+    берет блокировку записи, и другие соединения в таблицу не пишут до ее
+    конца. Строки без явного id получают id по порядку objects. С
+    keep_dates даты объектов из DATE_FIELDS возвращаются одним
+    bulk_update(): auto_now_add перезаписывает их при вставке.
+    """
+    field = DATE_FIELDS[model]
+    pks = [obj.pk for obj in objects]
+    dates = [getattr(obj, field) for obj in objects]
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Пустой UPDATE берет блокировку записи SQLite раньше MAX(id)
+        cursor.execute(f'UPDATE {model._meta.db_table} SET id = id WHERE 0')
+        last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        model.objects.bulk_create(objects, batch_size=batch_size)
+        explicit = {pk for pk in pks if pk is not None}
+        generated = iter(sorted(
+            set(model.objects.filter(id__gt=last_id)
+                .values_list('id', flat=True)) - explicit))
+        pks = [next(generated) if pk is None else pk for pk in pks]
+        for obj, pk, date in zip(objects, pks, dates):
+            obj.pk = pk
+            if keep_dates:
+                setattr(obj, field, date)
+        if keep_dates:
+            model.objects.bulk_update(objects, [field],
+                                      batch_size=batch_size or 500)
+    return pks
+
+
+class Importer:
+    def __init__(self, kind, create_users=False, keep_dates=False):
+        self.kind = kind
+        self.model = MODELS[kind]
+        self.create_users = create_users
+        self.keep_dates = keep_dates
+        self.users = {}
+        self.groups = {}
+
+    # Словари соответствий
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return
+        self.users.update(User.objects.filter(username__in=missing)
+                          .values_list('username', 'id'))
+        missing -= set(self.users)
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                [User(username=username, password='!')
+                 for username in sorted(missing)],
+                ignore_conflicts=True)
+            self.users.update(User.objects.filter(username__in=missing)
+                              .values_list('username', 'id'))
+
+    def _resolve_groups(self, slugs):
+        missing = set(slugs) - set(self.groups)
+        if missing:
+            self.groups.update(Group.objects.filter(slug__in=missing)
+                               .values_list('slug', 'id'))
+
+    def _user_id(self, username):
+        if username not in self.users:
+            raise ImportRowError(f'Нет пользователя {username!r}')
+        return self.users[username]
+
+    def _date(self, row, name):
+        if not self.keep_dates:
+            # Заполнит auto_now_add
+            return None
+        if not row.get(name):
+            return timezone.now()
+        value = parse_datetime(row[name])
+        if value is None:
+            raise ImportRowError(f'Некорректная дата {row[name]!r}')
+        return value
+
+    # Построение объектов
+
+    def _build_post(self, row):
+        group_id = None
+        if row.get('group'):
+            if row['group'] not in self.groups:
+                raise ImportRowError(f'Нет группы {row["group"]!r}')
+            group_id = self.groups[row['group']]
+        post = Post(id=row.get('id'), text=row['text'],
+                    author_id=self._user_id(row['author']),
+                    group_id=group_id, image=row.get('image', ''),
+                    pub_date=self._date(row, 'pub_date'))
+        return post
+
+    def _build_comment(self, row, existing_posts):
+        if row['post'] not in existing_posts:
+            raise ImportRowError(f'Нет поста {row["post"]!r}')
+        return Comment(id=row.get('id'), post_id=row['post'],
+                       author_id=self._user_id(row['author']),
+                       text=row['text'], created=self._date(row, 'created'))
+
+    def _build_follow(self, row):
+        user_id = self._user_id(row['user'])
+        author_id = self._user_id(row['author'])
+        if user_id == author_id:
+            raise ImportRowError('Подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def build(self, rows):
+        """Объекты пачки и список (номер строки, ошибка) для пропущенных"""
+        usernames = {row.get(key) for _, row in rows
+                     for key in ('author', 'user') if row.get(key)}
+        self._resolve_users(usernames)
+        existing_posts = set()
+        if self.kind == 'posts':
+            self._resolve_groups({row['group'] for _, row in rows
+                                  if row.get('group')})
+        elif self.kind == 'comments':
+            existing_posts = set(Post.objects.filter(
+                id__in={row.get('post') for _, row in rows})
+                .values_list('id', flat=True))
+        objects, errors = [], []
+        for number, row in rows:
+            try:
+                if self.kind == 'posts':
+                    objects.append(self._build_post(row))
+                elif self.kind == 'comments':
+                    objects.append(self._build_comment(row, existing_posts))
+                else:
+                    objects.append(self._build_follow(row))
+            except (ImportRowError, KeyError, TypeError) as error:
+                errors.append((number, error))
+        return objects, errors
+
+    def insert(self, objects):
+        """Вставляет пачку; возвращает id вставленных постов или
+        комментариев"""
+        if self.kind == 'follows':
+            # Повтор подписки при продолжении загрузки не ошибка
+            self.model.objects.bulk_create(objects, ignore_conflicts=True)
+            return []
+        return bulk_insert(self.model, objects, keep_dates=self.keep_dates)
+
+    def refresh(self, objects, ids):
+        """Приводит денормализованные данные в соответствие с пачкой"""
+        if self.kind == 'follows':
+            refresh_derived_data({(follow.user_id, follow.author_id)
+                                  for follow in objects}, post_ids=())
+        elif self.kind == 'posts':
+            refresh_derived_data(set(), post_ids=ids, author_ids={
+                post.author_id for post in objects})
+        else:
+            refresh_derived_data(set(), post_ids=(), comment_ids=ids)
+
+
+def refresh_derived_data(follow_pairs, post_ids=None, comment_ids=(),
+                         author_ids=()):
+    """Пересчитывает то, что обычно поддерживают сигналы моделей:
+    счетчики, «Популярное», поисковый индекс, ленты подписок и
+    поколения кэша.
+
+    С post_ids затрагиваются только вставленные посты и комментарии,
+    авторы author_ids и участники подписок follow_pairs; без него — все
+    данные, как после seed_data. Поколения кэша поднимаются после
+    коммита: иначе страница, собранная до него, легла бы в кэш под
+    новыми версиями.
+    """
+    if post_ids is None:
+        counters.reconcile_posts()
+        counters.reconcile_authors()
+        trending.rebuild()
+        search.rebuild_index()
+    else:
+        commented = set()
+        comment_ids = sorted(comment_ids)
+        for start in range(0, len(comment_ids), 500):
+            commented.update(Comment.objects.filter(
+                id__in=comment_ids[start:start + 500])
+                .values_list('post_id', flat=True))
+        counters.reconcile_posts(post_ids={*post_ids, *commented})
+        counters.reconcile_authors(user_ids={
+            *author_ids, *(user_id for pair in follow_pairs
+                           for user_id in pair)})
+        trending.record_comments(comment_ids)
+        search.index_posts(post_ids)
+        timeline.fan_out_posts(post_ids)
+    for user_id, author_id in follow_pairs:
+        timeline.backfill(user_id, author_id)
+    transaction.on_commit(
+        lambda: versions.bump(generations.EVERYTHING, generations.FEED))
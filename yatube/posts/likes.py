@@ -0,0 +1,36 @@
+"""Лайки с гарантией «не больше одного на пару (post, user)».
+
+Уникальность держит ограничение в базе, а не проверка перед вставкой:
+параллельные клики упираются в IntegrityError и не плодят дубли.
+Счетчик Post.likes_count обновляют сигналы в той же транзакции.
+"""
+from django.db import IntegrityError, transaction
+
+from posts.models import Like, Post
+
+
+def add_like(post_id, user):
+    """True, если лайк поставлен этим вызовом"""
+    try:
+        with transaction.atomic():
+            Like.objects.create(post_id=post_id, user=user, like=1)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_like(post_id, user):
+    """True, если лайк снят этим вызовом"""
+    deleted, _ = Like.objects.filter(post_id=post_id, user=user).delete()
+    return bool(deleted)
+
+
+@transaction.atomic
+def toggle_like(post_id, user):
+    """Снимает лайк или ставит его; возвращает (лайк стоит, число лайков)"""
+    liked = not remove_like(post_id, user)
+    if liked:
+        add_like(post_id, user)
+    likes_count = (Post.objects.filter(pk=post_id)
+                   .values_list('likes_count', flat=True).get())
+    return liked, likes_count
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и число SQL-запросов каждого маршрута posts '
+            'и api на синтетических данных разного размера и сравнивает '
+            'с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[100, 1000],
+                            help='Размеры набора данных (число постов)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Запросов к маршруту на один замер')
+        parser.add_argument('--baseline',
+                            help='JSON базовой линии для сравнения')
+        parser.add_argument('--save', help='Сохранить результаты в JSON')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимое замедление p50, доля')
+
+    def handle(self, *args, **options):
+        results = benchmark.run(options['sizes'], repeat=options['repeat'],
+                                stdout=self.stdout)
+        if options['save']:
+            benchmark.save(results, options['save'])
+        if not options['baseline']:
+            return
+        regressions = benchmark.compare(results,
+                                        benchmark.load(options['baseline']),
+                                        tolerance=options['tolerance'])
+        if regressions:
+            raise CommandError('Регрессии относительно базовой линии:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Применяет затухание к счетам «Популярного» и удаляет остывшие '
+            'посты; запускать периодически, например раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать счета по лайкам и комментариям')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            kept = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересчитано постов: {kept}'))
+            return
+        removed = trending.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено остывших постов: {removed}'))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from posts import exports
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии или лайки в NDJSON/CSV '
+            'с продолжением от водяного знака id')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', dest='export_format',
+                            choices=sorted(exports.FORMATS), default='ndjson')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+        parser.add_argument('--since-id', type=int,
+                            help='Выгрузить строки с id больше этого')
+        parser.add_argument('--since',
+                            help='Выгрузить строки, созданные не раньше '
+                                 'этой даты (ISO 8601)')
+        parser.add_argument('--state-file',
+                            help='Файл водяного знака: читается как '
+                                 '--since-id и обновляется после выгрузки')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since_id = options['since_id']
+        state_file = options['state_file']
+        if since_id is None and state_file:
+            try:
+                with open(state_file) as state:
+                    since_id = int(state.read().strip() or 0)
+            except FileNotFoundError:
+                pass
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since: ожидается дата ISO 8601')
+
+        # id строки, из которой собрана последняя полученная строка вывода
+        pending = {'id': since_id}
+
+        def tracked(rows):
+            for row in rows:
+                pending['id'] = row[0]
+                yield row
+
+        try:
+            rows = exports.iter_rows(options['kind'], since_id=since_id,
+                                     since=since,
+                                     chunk_size=options['chunk_size'])
+        except ValueError as error:
+            raise CommandError(error)
+        # Продолжение дописывает файл, заголовок CSV там уже есть
+        resume = bool(since_id)
+        lines = exports.format_rows(tracked(rows),
+                                    exports.export_fields(options['kind']),
+                                    options['export_format'],
+                                    header=not resume)
+        if options['output']:
+            output = open(options['output'], 'a' if resume else 'w',
+                          newline='', encoding='utf-8')
+        else:
+            output = self.stdout
+            output.ending = ''
+        watermark = since_id
+        try:
+            for line in lines:
+                output.write(line)
+                # Знак сдвигается только после записи строки
+                watermark = pending['id']
+        finally:
+            # Если дописанное не удалось сбросить на диск, знак не
+            # сохраняется: close() поднимет ошибку раньше
+            if output is not self.stdout:
+                output.close()
+            if state_file and watermark is not None:
+                with open(state_file, 'w') as state:
+                    state.write(str(watermark))
+        self.stderr.write(f'Водяной знак: {watermark}')
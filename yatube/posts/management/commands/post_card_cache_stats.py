@@ -0,0 +1,23 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts.templatetags.post_cards import (HITS_KEY, MISSES_KEY,
+                                           card_cache_stats)
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша карточек постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = card_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f'доля попаданий: {ratio:.1%}')
+        if options['reset']:
+            cache.delete_many([HITS_KEY, MISSES_KEY])
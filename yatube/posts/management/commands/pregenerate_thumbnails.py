@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создает миниатюры для уже загруженных картинок постов '
+            'в несколько процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.THUMBNAIL_WORKERS,
+                            help='Число процессов; 0 — в текущем процессе')
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct())
+        names = list(names)
+        if options['workers'] > 0:
+            with thumbnails.get_executor(options['workers']) as executor:
+                done = list(executor.map(thumbnails.generate, names,
+                                         chunksize=8))
+        else:
+            done = [thumbnails.generate(name) for name in names]
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для картинок: {len(done)}'))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок до TIMELINE_MAX_ENTRIES записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int,
+                            default=settings.TIMELINE_MAX_ENTRIES,
+                            help='Сколько новейших записей оставить в ленте')
+
+    def handle(self, *args, **options):
+        deleted = timeline.prune(options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей ленты: {deleted}'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс постов (SQLite FTS5) '
+            'в одной транзакции: до ее конца запись в базу ждет, поэтому '
+            'запускать лучше в тихое время')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько постов читать и вставлять в индекс '
+                                 'за один запрос')
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError(
+                'Индекс FTS5 недоступен: нужна SQLite с FTS5 и миграции '
+                'приложения posts')
+        total = search.rebuild_index(batch_size=options['batch_size'],
+                                     stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, постов: {total}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает хранимые счетчики лайков, комментариев, постов '
+            'и подписок, исправляя разошедшиеся значения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Сколько строк проверять за один запрос')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = counters.reconcile_posts(chunk_size)
+        authors = counters.reconcile_authors(chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено постов: {posts}, пользователей: {authors}'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетический набор данных: пользователей со '
+            'степенным графом подписок, группы, посты, комментарии и лайки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--likes', type=int, default=5000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--image-ratio', type=float, default=0.1,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help='Показатель степенного закона популярности')
+        parser.add_argument('--seed', type=int, dest='random_seed',
+                            help='Зерно генератора для воспроизводимости')
+
+    def handle(self, *args, **options):
+        created = seeding.seed(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            likes=options['likes'],
+            follows_per_user=options['follows_per_user'],
+            image_ratio=options['image_ratio'], alpha=options['alpha'],
+            random_seed=options['random_seed'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: ' + ', '.join(f'{name} {count}'
+                                   for name, count in created.items())))
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f"USING fts5(text, tokenize='unicode61')")
+        except OperationalError:
+            # SQLite собран без FTS5 — поиск останется на LIKE
+            return
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) '
+            f'SELECT id, text FROM posts_post')
+
+
+def drop_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_like_like'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    """Оставляет самый ранний лайк пары и пересчитывает likes_count"""
+    Like = apps.get_model('posts', 'Like')
+    Post = apps.get_model('posts', 'Post')
+    duplicates = (Like.objects.values('post_id', 'user_id')
+                  .annotate(total=Count('id'), keep=Min('id'))
+                  .filter(total__gt=1))
+    post_ids = set()
+    for pair in duplicates:
+        Like.objects.filter(post_id=pair['post_id'],
+                            user_id=pair['user_id']).exclude(
+            id=pair['keep']).delete()
+        post_ids.add(pair['post_id'])
+    for post_id in post_ids:
+        Post.objects.filter(pk=post_id).update(
+            likes_count=Like.objects.filter(post_id=post_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('post', 'user')},
+        ),
+    ]
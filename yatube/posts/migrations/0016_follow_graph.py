@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_like_unique'),
+    ]
+
+    operations = [
+        # Прежнее ограничение unique(author) не допускало дублей пар,
+        # поэтому новое ограничение накладывается без чистки данных
+        migrations.AlterUniqueTogether(
+            name='follow',
+            unique_together={('user', 'author')},
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'],
+                               name='follow_author_user_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import time
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_epoch(apps, schema_editor):
+    """Эпоха счетов «Популярного» — момент миграции"""
+    apps.get_model('posts', 'TrendingEpoch').objects.get_or_create(
+        pk=1, defaults={'timestamp': time.time()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('timestamp', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True, related_name='trending',
+                    serialize=False, to='posts.Post')),
+                ('score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
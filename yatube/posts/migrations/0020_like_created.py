@@ -0,0 +1,28 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_created(apps, schema_editor):
+    """Существующим лайкам — время публикации поста"""
+    Post = apps.get_model('posts', 'Post')
+    apps.get_model('posts', 'Like').objects.update(created=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('pub_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True,
+                                       default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -21,10 +22,16 @@ class Post(models.Model):
         help_text='Текст нового поста'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    # Меняется и при обновлении счетчиков: по нему считаются ETag и
+    # Last-Modified страниц (posts/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Отдельные индексы внешних ключей не нужны: их покрывают составные
+    # индексы лент из Meta.indexes
     author = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     group = models.ForeignKey(
         to=Group,
@@ -32,26 +39,51 @@ class Post(models.Model):
         help_text='Группа, к которой будет относиться пост',
         on_delete=models.SET_NULL,
         blank=True, null=True,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
         blank=True
     )
+    # Заполняются при загрузке, см. posts/images.py
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_variants = models.CharField(max_length=100, blank=True,
+                                      editable=False)
+    # Счетчики обновляются F()-выражениями, см. posts/counters.py
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты упорядочены по (pub_date, id) в обратном порядке; id в
+        # индексе задан явно, иначе rowid идет по возрастанию и SQLite
+        # досортировывает страницу во временном B-дереве
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def variant_widths(self):
+        return [int(width) for width in self.image_variants.split(',')
+                if width]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
         to=Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         to=User,
@@ -60,6 +92,13 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -83,17 +122,104 @@ class Follow(models.Model):
                 _('Нельзя делать подписываться на самого себя'))
 
     class Meta:
-        unique_together = ['author']
+        unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
 
 class Like(models.Model):
+    # Выборки по посту обслуживает индекс уникальности (post, user)
     post = models.ForeignKey(to=Post,
                              on_delete=models.CASCADE,
-                             related_name='likes')
+                             related_name='likes',
+                             db_index=False)
     user = models.ForeignKey(to=User,
                              on_delete=models.CASCADE,
                              related_name='likes')
     like = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['post', 'user']
 
     def __str__(self):
         return self.post.text
+
+
+class AuthorStats(models.Model):
+    """Хранимые счетчики пользователя: посты, подписчики, подписки"""
+    user = models.OneToOneField(
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Пост в предрассчитанной ленте подписок пользователя"""
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        to=Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Копии полей поста, чтобы лента читалась одним диапазоном индекса
+    author = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='timeline_user_feed_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} ← {self.post}'
+
+
+class TrendingScore(models.Model):
+    """Счет поста в «Популярном», см. posts/trending.py"""
+    post = models.OneToOneField(
+        to=Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.3f}'
+
+
+class TrendingEpoch(models.Model):
+    """Точка отсчета счетов TrendingScore (unix time); одна строка"""
+    timestamp = models.FloatField()
+
+    def __str__(self):
+        return str(self.timestamp)
@@ -0,0 +1,122 @@
+"""Полнотекстовый поиск постов через виртуальную таблицу SQLite FTS5.
+
+Индекс хранит копию текста поста с rowid = Post.id и синхронизируется
+сигналами сохранения/удаления. На бэкендах без FTS5 поиск откатывается
+к прежнему text__contains.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+
+FTS_TABLE = 'posts_post_fts'
+
+# Алиасы баз, в которых индекс уже найден
+_fts_ready = set()
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    """Есть ли индекс в базе using. Отсутствие не запоминается: таблицу
+    может создать миграция или обновление копии после старта процесса"""
+    if using in _fts_ready:
+        return True
+    database = connections[using]
+    if (database.vendor == 'sqlite'
+            and FTS_TABLE in database.introspection.table_names()):
+        _fts_ready.add(using)
+        return True
+    return False
+
+
+def build_match_query(keyword):
+    """Превращает пользовательский ввод в безопасный MATCH-запрос.
+
+    Каждое слово берется в кавычки и ищется по префиксу, слова
+    объединяются через AND — так синтаксис FTS5 из запроса не исполняется.
+    """
+    words = re.findall(r'\w+', keyword)
+    return ' '.join('"{}"*'.format(word.replace('"', '""'))
+                    for word in words)
+
+
+def search_posts(queryset, keyword):
+    """Посты, подходящие под запрос, по убыванию релевантности (bm25)"""
+    if not fts_available(queryset.db):
+        return queryset.filter(text__contains=keyword)
+    match = build_match_query(keyword)
+    if not match:
+        return queryset.none()
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = posts_post.id',
+               f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+        order_by=['search_rank', '-pub_date'],
+    )
+
+
+def index_post(post):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+            f'VALUES (%s, %s)', [post.pk, post.text])
+
+
+def remove_post(post_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def index_posts(post_ids, batch_size=1000):
+    """Добавляет в индекс посты post_ids, вставленные в обход сигналов"""
+    from posts.models import Post
+
+    if not fts_available():
+        return
+    post_ids = sorted(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        batch = list(Post.objects.filter(
+            id__in=post_ids[start:start + batch_size])
+            .values_list('id', 'text'))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+                f'VALUES (%s, %s)', batch)
+
+
+def rebuild_index(batch_size=1000, stdout=None):
+    """Перестраивает индекс целиком пачками по id; возвращает число постов.
+
+    Очистка и вставка — одна транзакция: до ее конца поиск читает
+    прежний индекс, а сбой посередине не оставляет его пустым.
+    """
+    from posts.models import Post
+
+    if not fts_available():
+        return 0
+    last_id, total = 0, 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        while True:
+            batch = list(Post.objects.using(DEFAULT_DB_ALIAS)
+                         .filter(id__gt=last_id)
+                         .order_by('id')
+                         .values_list('id', 'text')[:batch_size])
+            if not batch:
+                break
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)',
+                batch)
+            last_id = batch[-1][0]
+            total += len(batch)
+            if stdout is not None:
+                stdout.write(f'Проиндексировано постов: {total}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return total
@@ -0,0 +1,138 @@
+"""Генерация правдоподобного набора данных для нагрузочных замеров.
+
+Популярность авторов распределена по степенному закону: вес автора
+с рангом r равен 1 / r ** alpha. По этим весам выбираются и подписки,
+и авторы постов, поэтому несколько авторов собирают большую часть
+подписчиков, как в живом сообществе. Комментарии и лайки так же
+тяготеют к небольшому числу популярных постов.
+"""
+import random
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts.imports import bulk_insert, refresh_derived_data
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+# Django 2.2 вставляет пачку в SQLite одним INSERT ... SELECT UNION ALL,
+# а в составном SELECT не больше 500 частей
+BATCH_SIZE = 500
+IMAGE_POOL = 5
+
+
+def power_law_weights(count, alpha):
+    return [1 / (rank ** alpha) for rank in range(1, count + 1)]
+
+
+def _images(rng, tag):
+    """Несколько маленьких картинок, которые переиспользуются постами"""
+    names = []
+    for index in range(IMAGE_POOL):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = BytesIO()
+        Image.new('RGB', (960, 540), color).save(buffer, format='JPEG')
+        names.append(default_storage.save(f'posts/seed-{tag}-{index}.jpg',
+                                          ContentFile(buffer.getvalue())))
+    return names
+
+
+def seed(users=100, groups=10, posts=1000, comments=2000, likes=5000,
+         follows_per_user=20, image_ratio=0.1, alpha=1.2, days=365,
+         random_seed=None, stdout=None):
+    """Создает данные и возвращает словарь с числом созданных объектов"""
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    tag = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    now = timezone.now()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    User.objects.bulk_create(
+        [User(username=f'seed-{tag}-{index}', first_name=fake.first_name(),
+              last_name=fake.last_name(), password='!')
+         for index in range(users)],
+        batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.filter(username__startswith=f'seed-{tag}-')
+                    .values_list('id', flat=True))
+    # Ранг популярности не совпадает с порядком создания
+    rng.shuffle(user_ids)
+    author_weights = power_law_weights(len(user_ids), alpha)
+    log(f'Пользователей: {len(user_ids)}')
+
+    Group.objects.bulk_create(
+        [Group(title=fake.catch_phrase()[:200], slug=f'seed-{tag}-{index}',
+               description=fake.paragraph())
+         for index in range(groups)])
+    group_ids = list(Group.objects.filter(slug__startswith=f'seed-{tag}-')
+                     .values_list('id', flat=True))
+    log(f'Групп: {len(group_ids)}')
+
+    follow_pairs = set()
+    for user_id in user_ids:
+        for author_id in rng.choices(user_ids, author_weights,
+                                     k=follows_per_user):
+            if author_id != user_id:
+                follow_pairs.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in follow_pairs],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    # Пары, отброшенные ограничениями уникальности, в ленты не попадают
+    follow_pairs = set(Follow.objects.filter(user_id__in=user_ids)
+                       .values_list('user_id', 'author_id'))
+    log(f'Подписок: {len(follow_pairs)}')
+
+    images = _images(rng, tag) if image_ratio else []
+    post_authors = rng.choices(user_ids, author_weights, k=posts)
+    bulk_insert(
+        Post,
+        [Post(text=fake.text(max_nb_chars=rng.choice((80, 300, 1200))),
+              author_id=author_id,
+              group_id=(rng.choice(group_ids)
+                        if group_ids and rng.random() < 0.7 else None),
+              image=(rng.choice(images)
+                     if images and rng.random() < image_ratio else ''),
+              pub_date=now - timedelta(seconds=rng.randrange(
+                  days * 24 * 60 * 60)))
+         for author_id in post_authors],
+        keep_dates=True, batch_size=BATCH_SIZE)
+    post_rows = list(Post.objects.filter(author_id__in=user_ids)
+                     .order_by('-pub_date')
+                     .values_list('id', 'pub_date'))
+    post_weights = power_law_weights(len(post_rows), alpha)
+    log(f'Постов: {len(post_rows)}')
+
+    if post_rows:
+        bulk_insert(
+            Comment,
+            [Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                     text=fake.sentence(),
+                     created=min(now, pub_date + timedelta(
+                         minutes=rng.randrange(60 * 24 * 7))))
+             for post_id, pub_date in rng.choices(
+                 post_rows, post_weights, k=comments)],
+            keep_dates=True, batch_size=BATCH_SIZE)
+        like_dates = {}
+        for post_id, pub_date in rng.choices(post_rows, post_weights,
+                                             k=likes):
+            like_dates[post_id, rng.choice(user_ids)] = min(
+                now, pub_date + timedelta(minutes=rng.randrange(60 * 24 * 7)))
+        bulk_insert(
+            Like,
+            [Like(post_id=post_id, user_id=user_id, like=1, created=created)
+             for (post_id, user_id), created in like_dates.items()],
+            keep_dates=True, batch_size=BATCH_SIZE)
+        log(f'Комментариев: {comments}, лайков: {len(like_dates)}')
+
+    refresh_derived_data(follow_pairs)
+    return {'users': len(user_ids), 'groups': len(group_ids),
+            'follows': len(follow_pairs), 'posts': len(post_rows)}
@@ -0,0 +1,40 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from posts.models import Group, Post
+
+
+class SparseFieldsMixin:
+    """Оставляет в ответе на чтение только поля из ?fields=id,text.
+
+    Запись ?fields= не учитывает: иначе отброшенные поля молча
+    исчезали бы из принимаемых данных.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        if request is None or request.method not in SAFE_METHODS:
+            return set()
+        value = request.query_params.get('fields', '')
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+    group = serializers.SlugRelatedField(slug_field='slug',
+                                         queryset=Group.objects.all(),
+                                         required=False, allow_null=True)
+
+    class Meta:
+        model = Post
+        fields = ('id', 'text', 'pub_date', 'author', 'group', 'image',
+                  'likes_count', 'comments_count')
+        read_only_fields = ('pub_date', 'likes_count', 'comments_count')
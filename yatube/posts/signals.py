@@ -0,0 +1,172 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.utils import versions
+from posts import counters, generations, images, search, timeline, trending
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def process_uploaded_image(sender, instance, raw=False, **kwargs):
+    image = instance.image
+    if raw or not image or image._committed:
+        return
+    try:
+        content, width, height = images.strip_metadata(image.file)
+    except OSError:
+        # Не картинка — валидацию оставляем форме
+        return
+    image.file = content
+    instance.image_width, instance.image_height = width, height
+    instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_author(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Like)
+def count_new_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, likes_count=1)
+
+
+@receiver(post_delete, sender=Like)
+def count_deleted_like(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, likes_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Like)
+def score_new_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record(instance.post_id, settings.TRENDING_WEIGHTS['like'])
+
+
+@receiver(post_delete, sender=Like)
+def score_deleted_like(sender, instance, **kwargs):
+    # Вычитается ровно то, что лайк добавил в момент создания
+    trending.record(instance.post_id, -settings.TRENDING_WEIGHTS['like'],
+                    now=instance.created.timestamp())
+
+
+@receiver(post_save, sender=Comment)
+def score_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record(instance.post_id,
+                        settings.TRENDING_WEIGHTS['comment'])
+
+
+@receiver(post_delete, sender=Comment)
+def score_deleted_comment(sender, instance, **kwargs):
+    # Вычитается ровно то, что комментарий добавил в момент создания
+    trending.record(instance.post_id,
+                    -settings.TRENDING_WEIGHTS['comment'],
+                    now=instance.created.timestamp())
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_author(instance.author_id, followers_count=1)
+        counters.bump_author(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, followers_count=-1)
+    counters.bump_author(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_card(sender, instance, **kwargs):
+    versions.bump(f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_cards(sender, instance, **kwargs):
+    versions.bump(f'group:{instance.pk}', generations.EVERYTHING)
+
+
+@receiver(post_save, sender=User)
+def bump_author_cards(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login — карточки не меняются
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    versions.bump(f'author:{instance.pk}', generations.EVERYTHING)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    if instance.pk and not raw:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_pages(sender, instance, **kwargs):
+    group_ids = {instance.group_id,
+                 getattr(instance, '_previous_group_id', None)} - {None}
+    slugs = (Group.objects.filter(pk__in=group_ids)
+             .values_list('slug', flat=True))
+    versions.bump(generations.FEED,
+                  generations.author(instance.author.username),
+                  *(generations.group(slug) for slug in slugs))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_pages(sender, instance, **kwargs):
+    # Профили показывают число подписчиков и подписок
+    versions.bump(generations.author(instance.author.username),
+                  generations.author(instance.user.username))
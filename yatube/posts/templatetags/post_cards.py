@@ -0,0 +1,83 @@
+import threading
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import routers
+from core.utils.versions import get_versions, incr_counter
+
+register = template.Library()
+
+HITS_KEY = 'post_card:hits'
+MISSES_KEY = 'post_card:misses'
+
+# Попадания и промахи копятся в процессе и уходят в кэш пачкой: incr в
+# общем кэше на каждую карточку — лишняя запись. Несброшенный остаток
+# процесса теряется при его завершении.
+_stats_lock = threading.Lock()
+_pending = {HITS_KEY: 0, MISSES_KEY: 0}
+
+
+def card_versions(post):
+    """Версии поста, его группы и автора"""
+    return get_versions(
+        f'post:{post.pk}',
+        f'group:{post.group_id}',
+        f'author:{post.author_id}',
+    )
+
+
+def card_cache_key(post, versions=None):
+    """Ключ фрагмента зависит от версий поста, его группы и автора"""
+    post_version, group_version, author_version = (
+        versions or card_versions(post))
+    return (f'post_card:{post.pk}:{post_version}:'
+            f'{group_version}:{author_version}')
+
+
+def _count(key):
+    with _stats_lock:
+        _pending[key] += 1
+        total = sum(_pending.values())
+    if total >= getattr(settings, 'POST_CARD_STATS_FLUSH_EVERY', 100):
+        flush_card_cache_stats()
+
+
+def flush_card_cache_stats():
+    """Переносит накопленные процессом попадания и промахи в кэш"""
+    global _pending
+    with _stats_lock:
+        pending = _pending
+        _pending = dict.fromkeys(pending, 0)
+    for key, value in pending.items():
+        if value:
+            incr_counter(key, value)
+
+
+def card_cache_stats():
+    flush_card_cache_stats()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {'hits': hits, 'misses': misses}
+
+
+@register.simple_tag
+def post_card(post):
+    """Карточка поста из кэша фрагментов, при промахе — рендер шаблона"""
+    versions = card_versions(post)
+    key = card_cache_key(post, versions)
+    html = cache.get(key)
+    if html is None:
+        _count(MISSES_KEY)
+        html = render_to_string('posts/includes/post_card.html',
+                                {'post': post})
+        # Карточку из копии, не видевшей правку, не кэшируем под новыми
+        # версиями
+        if routers.reads_include(*versions):
+            cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    else:
+        _count(HITS_KEY)
+    return mark_safe(html)
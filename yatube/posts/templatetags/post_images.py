@@ -0,0 +1,20 @@
+from django import template
+
+from posts.images import card_height, variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_srcset(post, extension):
+    """srcset из построенных вариантов картинки: «url 320w, url 640w»"""
+    return ', '.join(
+        f'{variant_url(post.image.name, width, extension)} {width}w'
+        for width in post.variant_widths)
+
+
+@register.simple_tag
+def image_box(post):
+    """width и height картинки карточки по сохраненной ширине оригинала"""
+    return {'width': post.image_width,
+            'height': card_height(post.image_width)}
@@ -1,7 +1,22 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from ..models import Group, Post
+from .. import benchmark, search
+from ..imports import Importer
+from ..models import (AuthorStats, Comment, Follow, Group, Like, Post,
+                      TimelineEntry, TrendingScore)
 
 User = get_user_model()
 
@@ -56,3 +71,250 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(post._meta.get_field(field).help_text,
                                  expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_write_paths(self):
+        """Проверяем, что счетчики меняются вместе с записями."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        like = Like.objects.create(post=post, user=self.reader, like=1)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (1, 1))
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts_count,
+                         1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).following_count, 1)
+
+        like.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Проверяем, что reconcile_counters исправляет разошедшиеся
+        счетчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Like.objects.create(post=post, user=self.reader, like=1)
+        Post.objects.filter(pk=post.pk).update(likes_count=42)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts_count,
+                         1)
+
+
+class UserDeletionTest(TransactionTestCase):
+    def test_delete_user_with_posts_and_follows(self):
+        """Проверяем, что удаление пользователя с постами, подписчиками и
+        подписками не воссоздает его счетчики и не ломает чужие."""
+        author = User.objects.create_user(username='leaving')
+        readers = [User.objects.create_user(username=f'stays{index}')
+                   for index in range(2)]
+        for index in range(2):
+            Post.objects.create(author=author, text=f'Пост {index}')
+            Follow.objects.create(user=readers[index], author=author)
+            Follow.objects.create(user=author, author=readers[index])
+
+        author.delete()
+
+        self.assertFalse(AuthorStats.objects.filter(user_id=author.pk)
+                         .exists())
+        for reader in readers:
+            stats = AuthorStats.objects.get(user=reader)
+            self.assertEqual(
+                (stats.followers_count, stats.following_count), (0, 0))
+
+
+class ImportRowsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='importer')
+        cls.reader = User.objects.create_user(username='import_reader')
+        cls.group = Group.objects.create(title='Импорт', slug='import')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write(self, rows):
+        path = os.path.join(self.directory, 'rows.jsonl')
+        with open(path, 'w', encoding='utf-8') as source:
+            for row in rows:
+                source.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def _import(self, *args, **options):
+        call_command('import_rows', *args, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def test_import_posts_keeps_dates_only_on_request(self):
+        """Проверяем, что даты из файла берутся только с --keep-dates."""
+        path = self._write([
+            {'text': 'Первый', 'author': 'importer', 'group': 'import',
+             'pub_date': '2020-01-01T10:00:00+00:00'},
+            {'text': 'Без автора', 'author': 'nobody'},
+        ])
+        self._import('posts', path, batch_size=1)
+        self.assertNotEqual(Post.objects.get(text='Первый').pub_date.year,
+                            2020)
+        self.assertFalse(Post.objects.filter(text='Без автора').exists())
+
+        Post.objects.all().delete()
+        self._import('posts', path, keep_dates=True)
+        post = Post.objects.get(text='Первый')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts_count,
+                         1)
+
+    def test_import_keeps_dates_with_one_update(self):
+        """Проверяем, что даты пачки возвращаются одним UPDATE, а не
+        запросом на каждую дату."""
+        path = self._write([
+            {'text': f'Пост {day}', 'author': 'importer',
+             'pub_date': f'2020-01-0{day}T10:00:00+00:00'}
+            for day in range(1, 4)])
+        with CaptureQueriesContext(connection) as queries:
+            self._import('posts', path, keep_dates=True)
+        self.assertEqual(
+            sorted(Post.objects.values_list('pub_date__day', flat=True)),
+            [1, 2, 3])
+        self.assertEqual(
+            len([query for query in queries.captured_queries
+                 if query['sql'].startswith('UPDATE "posts_post" SET '
+                                            '"pub_date"')]),
+            1)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Проверяем, что повторный запуск продолжает с точки сохранения."""
+        path = self._write([{'user': 'import_reader', 'author': 'importer'}])
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        self._import('follows', path, checkpoint=checkpoint)
+        Follow.objects.all().delete()
+        self._import('follows', path, checkpoint=checkpoint)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_import_resume_keeps_derived_data_of_committed_batches(self):
+        """Проверяем, что после сбоя и продолжения счетчики, индекс и лента
+        учитывают и пачки, загруженные до сбоя."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        path = self._write([
+            {'text': 'До сбоя', 'author': 'importer'},
+            {'text': 'После сбоя', 'author': 'importer'},
+        ])
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        build = Importer.build
+        calls = []
+
+        def crash_on_second_batch(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('Сбой')
+            return build(importer, rows)
+
+        with mock.patch.object(Importer, 'build', crash_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                self._import('posts', path, batch_size=1,
+                             checkpoint=checkpoint)
+        self._import('posts', path, batch_size=1, checkpoint=checkpoint)
+
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts_count,
+                         2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        if search.fts_available():
+            self.assertEqual(
+                list(search.search_posts(Post.objects.all(), 'сбоя')
+                     .order_by('id').values_list('text', flat=True)),
+                ['До сбоя', 'После сбоя'])
+
+    def test_import_follows_fill_timeline(self):
+        """Проверяем, что загруженные подписки попадают в ленту."""
+        post = Post.objects.create(author=self.author, text='Пост автора')
+        path = self._write([{'user': 'import_reader', 'author': 'importer'}])
+        self._import('follows', path)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader)
+                 .values_list('post', flat=True)),
+            [post.id])
+
+    def test_import_comments_refreshes_only_new_rows(self):
+        """Проверяем, что после загрузки комментариев пересчитываются
+        только их посты, а даты из файла сохраняются."""
+        post = Post.objects.create(author=self.author, text='Обсуждаемый')
+        other = Post.objects.create(author=self.author, text='Другой')
+        Post.objects.filter(pk=other.pk).update(comments_count=5)
+        created = timezone.now() - timedelta(hours=1)
+        path = self._write([
+            {'post': post.id, 'author': 'import_reader', 'text': 'Первый',
+             'created': created.isoformat()},
+            {'post': post.id, 'author': 'import_reader', 'text': 'Второй',
+             'id': 500},
+        ])
+        self._import('comments', path, keep_dates=True)
+        self.assertEqual(Comment.objects.get(text='Первый').created, created)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertTrue(TrendingScore.objects.filter(post=post).exists())
+        other.refresh_from_db()
+        self.assertEqual(other.comments_count, 5)
+
+
+class SeedDataTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_seed_data_builds_consistent_dataset(self):
+        """Проверяем, что засеянные данные согласованы со счетчиками."""
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command('seed_data', users=20, groups=2, posts=60,
+                         comments=40, likes=100, follows_per_user=5,
+                         image_ratio=0.5, seed=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(Comment.objects.count(), 40)
+        stats = AuthorStats.objects.order_by('-followers_count')
+        self.assertEqual(sum(stats.values_list('followers_count', flat=True)),
+                         Follow.objects.count())
+        # Степенной закон: у самого популярного автора больше подписчиков,
+        # чем в среднем
+        self.assertGreater(stats[0].followers_count,
+                           Follow.objects.count() / 20)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(author__following__user=follow.user).count())
+
+    def test_benchmark_compare_reports_regressions(self):
+        """Проверяем, что сравнение с базовой линией находит регрессии."""
+        baseline = {'100': {
+            'posts:index': {'p50_ms': 10.0, 'queries': 3},
+            'posts:profile': {'p50_ms': 0.5, 'queries': 5},
+        }}
+        results = {'100': {
+            'posts:index': {'p50_ms': 20.0, 'queries': 4},
+            'posts:profile': {'p50_ms': 1.0, 'queries': 5},
+            'posts:group_list': {'p50_ms': 50.0, 'queries': 9},
+        }}
+        regressions = benchmark.compare(results, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all('posts:index' in line for line in regressions))
@@ -1,15 +1,31 @@
+import os
 import shutil
 import tempfile
+import time
+from datetime import timedelta
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import Client, TestCase, override_settings
-from django.urls import reverse
-
-from posts.models import Follow, Group, Post, User
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.utils.page_cache import CACHE_HEADER
+from core.utils.query_audit import get_view_budget
+from core.utils.query_plan import plan_problems
+from posts import benchmark, images, search, seeding, thumbnails, trending
+from posts.models import (Comment, Follow, Group, Like, Post, TimelineEntry,
+                          TrendingScore, User)
+from posts.templatetags.post_cards import (HITS_KEY, card_cache_stats,
+                                           flush_card_cache_stats)
 
 # Создаем временную папку для медиа-файлов;
 # на момент теста медиа папка будет переопределена
@@ -177,6 +193,7 @@ class PostsViewTests(TestCase):
         self._assert_check_form_true(response)
 
 
+@override_settings(FEED_PAGINATION='numbered')
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -226,6 +243,61 @@ class PaginatorViewsTest(TestCase):
                                  ADDITIONAL_POSTS)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser3')
+        cls.group = Group.objects.create(
+            title='test_title',
+            description='test_description',
+            slug='test-slug'
+        )
+        Post.objects.bulk_create([
+            Post(text=f'text{post_temp}', author=cls.author, group=cls.group)
+            for post_temp in range(ADDITIONAL_POSTS + settings.AMOUNT_POSTS)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_user = Client()
+
+    def _paginator_pages(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author})
+        ]
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Проверка: курсор ведет на следующую страницу и обратно."""
+        for reverse_name in self._paginator_pages():
+            with self.subTest(reverse_name=reverse_name):
+                first = self.guest_user.get(reverse_name)
+                first_page = first.context['page_obj']
+                self.assertEqual(len(first_page), settings.AMOUNT_POSTS)
+                self.assertFalse(first_page.has_previous())
+
+                second = self.guest_user.get(
+                    reverse_name, {'cursor': first_page.next_cursor})
+                second_page = second.context['page_obj']
+                self.assertEqual(len(second_page), ADDITIONAL_POSTS)
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(set(first_page) & set(second_page))
+
+                back = self.guest_user.get(
+                    reverse_name, {'cursor': second_page.previous_cursor})
+                self.assertEqual(list(back.context['page_obj']),
+                                 list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: битый токен курсора открывает первую страницу."""
+        response = self.guest_user.get(reverse('posts:index'),
+                                       {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
 class IndexPageCacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -245,20 +317,41 @@ class IndexPageCacheTest(TestCase):
         # Проверяем, что запись присутствует в содержимом ответа.
         response = self.client.get(reverse('posts:index'))
         self.assertContains(response, self.post.text)
+        self.assertEqual(response[CACHE_HEADER], 'miss')
 
-        # Далее удаляем запись из базы данных
-        self.post.delete()
+        # Повторный запрос отдается из кэша без ORM и шаблонов
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertEqual(response[CACHE_HEADER], 'hit')
 
-        # Удаленная запись все еще присутствует в содержимом ответа
+        # Удаление поднимает поколение ленты — запись сразу пропадает
+        self.post.delete()
         response = self.client.get(reverse('posts:index'))
-        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, self.post.text)
 
-        # Очищаем кэш
+    def test_group_and_profile_pages_invalidated_by_new_post(self):
+        """Проверка: новый пост сразу виден на страницах группы и автора."""
         cache.clear()
-
-        # Проверяем, что удаленной записи больше нет в содержимом ответа
+        urls = [
+            reverse('posts:group_list', kwargs={'slug': self.post.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user_author}),
+        ]
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(author=self.user_author, group=self.post.group,
+                            text='Свежий пост')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_authorized_user_bypasses_page_cache(self):
+        """Проверка: авторизованный пользователь не получает кэш анонимов."""
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.user_author)
         response = self.client.get(reverse('posts:index'))
-        self.assertNotContains(response, self.post.text)
+        self.assertFalse(response.has_header(CACHE_HEADER))
 
 
 class FollowTests(TestCase):
@@ -364,3 +457,558 @@ class FollowTests(TestCase):
         """Тестируем доступность страницы follow для анонимного пользователя"""
         response = self.guest_user.get(reverse('posts:follow_index'))
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='SearchAuthor')
+        cls.relevant = Post.objects.create(
+            author=cls.author, text='Котики котики и еще раз котики')
+        cls.mention = Post.objects.create(
+            author=cls.author, text='Про собак, но один котик тоже есть')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Совсем о другом')
+
+    def setUp(self):
+        cache.clear()
+
+    def _search(self, keyword):
+        response = self.client.get(reverse('posts:index'), {'q': keyword})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_by_relevance(self):
+        """Проверка: поиск находит посты по префиксу и ранжирует их."""
+        self.assertEqual(self._search('котик'),
+                         [self.relevant, self.mention])
+
+    def test_search_index_follows_edit_and_delete(self):
+        """Проверка: индекс обновляется при правке и удалении поста."""
+        self.other.text = 'Теперь и тут котик'
+        self.other.save()
+        self.assertIn(self.other, self._search('котик'))
+        self.other.delete()
+        self.assertNotIn(self.other, self._search('котик'))
+
+    def test_search_ignores_match_syntax(self):
+        """Проверка: спецсимволы FTS5 в запросе не ломают страницу."""
+        self.assertEqual(self._search('"котик* ('),
+                         [self.relevant, self.mention])
+
+    def test_rebuild_search_index_command(self):
+        """Проверка: команда перестраивает индекс для всех постов."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='котик из массовой загрузки')])
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(self._search('массовой')), 1)
+
+    def test_failed_rebuild_keeps_index(self):
+        """Проверка: сбой посреди перестройки не оставляет индекс пустым."""
+        class BrokenOutput:
+            def write(self, message):
+                raise RuntimeError(message)
+
+        with self.assertRaises(RuntimeError):
+            search.rebuild_index(batch_size=1, stdout=BrokenOutput())
+        self.assertEqual(self._search('котик'),
+                         [self.relevant, self.mention])
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TimelineReader')
+        cls.author = User.objects.create_user(username='TimelineAuthor')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(user=self.user)
+
+    def _feed(self):
+        response = self.authorized_user.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Проверка: подписка догружает посты, новый пост попадает в ленту."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self._feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self._feed(), [new_post, self.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        """Проверка: после отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertEqual(self._feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    def test_prune_timelines_keeps_newest_entries(self):
+        """Проверка: команда prune_timelines оставляет новейшие записи."""
+        Follow.objects.create(user=self.user, author=self.author)
+        newest = Post.objects.create(author=self.author, text='Новейший')
+        call_command('prune_timelines', max_entries=1, stdout=StringIO())
+        self.assertEqual(self._feed(), [newest])
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='CardAuthor',
+                                              first_name='Имя')
+        cls.group = Group.objects.create(title='Группа', slug='card-slug')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Текст карточки')
+
+    def setUp(self):
+        # Остаток счетчиков других тестов не должен попасть в этот
+        flush_card_cache_stats()
+        cache.clear()
+        # Авторизованный клиент, чтобы страницы не брались из кэша анонимов
+        self.client.force_login(self.author)
+
+    def test_second_render_hits_cache(self):
+        """Проверка: повторный показ карточки берется из кэша, а счетчики
+        пишутся в кэш пачкой, а не на каждую карточку."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertIsNone(cache.get(HITS_KEY))
+        self.assertEqual(card_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_edits_invalidate_card(self):
+        """Проверка: правки поста и автора сразу видны в карточке."""
+        self.client.get(reverse('posts:index'))
+        self.post.text = 'Новый текст карточки'
+        self.post.save()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'Новый текст карточки')
+        self.author.first_name = 'Другое'
+        self.author.save()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'Другое')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ThumbAuthor')
+        image = Image.new('RGB', (40, 20), color='red')
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        cls.post = Post.objects.create(
+            author=cls.author, text='С картинкой',
+            image=SimpleUploadedFile('thumb.png', buffer.getvalue(),
+                                     content_type='image/png'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def _thumbnails(self):
+        cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        return [name for _, _, files in os.walk(cache_dir) for name in files]
+
+    def test_pregenerate_thumbnails_command(self):
+        """Проверка: команда заранее создает миниатюры шаблонов."""
+        self.assertEqual(self._thumbnails(), [])
+        call_command('pregenerate_thumbnails', workers=0, stdout=StringIO())
+        self.assertEqual(len(self._thumbnails()),
+                         len(settings.POST_THUMBNAIL_GEOMETRIES))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ResponsiveImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ImageAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def _upload(self):
+        image = Image.new('RGB', (700, 400), color='blue')
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCamera'
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    def test_upload_stores_dimensions_and_strips_metadata(self):
+        """Проверка: размеры сохраняются, EXIF из файла удаляется."""
+        post = Post.objects.create(author=self.author, text='Фото',
+                                   image=self._upload())
+        self.assertEqual((post.image_width, post.image_height), (700, 400))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_variants_emitted_as_srcset(self):
+        """Проверка: построенные варианты попадают в srcset страницы."""
+        post = Post.objects.create(author=self.author, text='Фото',
+                                   image=self._upload())
+        thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        self.assertEqual(post.variant_widths, [320, 640])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, '-640.webp 640w')
+        self.assertContains(response, '-320.jpeg 320w')
+        self.assertContains(response, 'width="700" height="247"')
+
+    def test_variant_names_keep_source_extension(self):
+        """Проверка: у photo.jpg и photo.png разные варианты."""
+        self.assertNotEqual(
+            images.variant_name('posts/photo.jpg', 320, 'webp'),
+            images.variant_name('posts/photo.png', 320, 'webp'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    """Тестовый раннер включает QUERY_AUDIT = 'strict': превышение бюджета
+    или N+1 поднимает QueryBudgetExceeded прямо из запроса."""
+    # Корень API генерирует роутер DRF
+    UNBUDGETED = {'api_posts:api-root'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seeding.seed(users=10, groups=2, posts=40, comments=60, likes=80,
+                     follows_per_user=4, image_ratio=0.2, random_seed=1)
+        cls.user = User.objects.order_by('-stats__following_count')[0]
+        cls.user.is_staff = True
+        cls.user.save()
+        cls.urls = {
+            route: reverse(route, kwargs={
+                param: value for param, value
+                in benchmark.sample_kwargs(cls.user).items()
+                if param in params})
+            for route, params in benchmark.route_names()}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_every_view_declares_budget(self):
+        """Проверяем, что у каждого маршрута есть бюджет запросов."""
+        for route, url in self.urls.items():
+            if route in self.UNBUDGETED:
+                continue
+            with self.subTest(route=route):
+                view = resolve(url).func
+                self.assertTrue(any(
+                    get_view_budget(view, method) is not None
+                    for method in ('GET', 'POST', 'PUT', 'DELETE')))
+
+    def test_view_queries_use_indexes(self):
+        """Проверяем, что запросы страниц, включая вторые страницы лент,
+        идут по индексам без сортировки во временном B-дереве."""
+        for route, url in self.urls.items():
+            with self.subTest(route=route), CaptureQueriesContext(
+                    connection) as captured:
+                response = self.authorized_client.get(url)
+                page = response.context and response.context.get('page_obj')
+                if getattr(page, 'next_cursor', None):
+                    self.authorized_client.get(
+                        url, {'cursor': page.next_cursor})
+            with self.subTest(route=route):
+                # Форма поста целиком выводит короткий список групп
+                self.assertEqual(plan_problems(captured.captured_queries,
+                                               allow_scans={'posts_group'}),
+                                 [])
+
+    def test_views_stay_within_budget(self):
+        """Проверяем, что страницы укладываются в бюджет без N+1."""
+        for route, url in self.urls.items():
+            for client in (self.authorized_client, Client()):
+                with self.subTest(route=route):
+                    response = client.get(url)
+                    self.assertLess(response.status_code, 500)
+
+
+class LikeToggleTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='liker')
+        cls.post = Post.objects.create(author=cls.user, text='Нравится')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:post_like_toggle',
+                           kwargs={'post_id': self.post.id})
+
+    def test_toggle_returns_new_count(self):
+        """Проверяем, что переключатель ставит и снимает лайк в JSON."""
+        for liked, likes_count in ((True, 1), (False, 0), (True, 1)):
+            with self.subTest(liked=liked):
+                response = self.authorized_client.post(
+                    self.url, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.json(),
+                                 {'liked': liked, 'likes_count': likes_count})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_form_submit_redirects_to_post(self):
+        """Проверяем, что форма без JS возвращается на страницу поста."""
+        response = self.authorized_client.post(self.url)
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertTrue(Like.objects.filter(post=self.post,
+                                            user=self.user).exists())
+
+    def test_duplicate_like_rejected(self):
+        """Проверяем, что база не принимает второй лайк той же пары."""
+        Like.objects.create(post=self.post, user=self.user, like=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Like.objects.create(post=self.post, user=self.user, like=1)
+        self.authorized_client.get(reverse('posts:post_like',
+                                           kwargs={'post_id': self.post.id}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_toggle_missing_post(self):
+        """Проверяем, что лайк несуществующего поста отдает 404."""
+        response = self.authorized_client.post(
+            reverse('posts:post_like_toggle', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+@override_settings(COMMENTS_PER_PAGE=4)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        for index in range(6):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {index}')
+
+    def setUp(self):
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.id})
+        self.comments_url = reverse('posts:comments',
+                                    kwargs={'post_id': self.post.id})
+
+    def test_detail_renders_first_page(self):
+        """Проверяем, что страница поста выводит только первые комментарии."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual([comment.text for comment in
+                          response.context['comments']],
+                         [f'Комментарий {index}' for index in range(4)])
+        self.assertContains(response, 'data-comments-more')
+
+    def test_next_page_as_fragment_and_json(self):
+        """Проверяем, что следующая порция приходит фрагментом и JSON."""
+        cursor = self.client.get(
+            self.detail_url).context['comments_page'].next_cursor
+        fragment = self.client.get(self.comments_url, {'cursor': cursor})
+        self.assertTemplateUsed(fragment, 'posts/includes/comments.html')
+        self.assertNotContains(fragment, '<html')
+        self.assertContains(fragment, 'Комментарий 5')
+        self.assertNotContains(fragment, 'data-comments-more')
+
+        data = self.client.get(self.comments_url, {'cursor': cursor},
+                               HTTP_ACCEPT='application/json').json()
+        self.assertEqual([comment['text'] for comment in data['results']],
+                         ['Комментарий 4', 'Комментарий 5'])
+        self.assertIsNone(data['next'])
+
+    def test_detail_page_follows_comment_cursor(self):
+        """Проверяем, что ссылка без JS открывает следующую порцию."""
+        cursor = self.client.get(
+            self.detail_url).context['comments_page'].next_cursor
+        response = self.client.get(self.detail_url, {'comments': cursor})
+        self.assertEqual(len(response.context['comments']), 2)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='etag-group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Неизменный пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:comments', kwargs={'post_id': self.post.id}),
+        ]
+
+    def test_unchanged_pages_not_modified(self):
+        """Проверяем, что повтор с If-None-Match получает 304 без рендера."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                cached = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(cached.templates)
+
+    def test_changes_renew_validators(self):
+        """Проверяем, что лайк, комментарий и правка группы меняют ETag."""
+        detail, group = self.urls[3], self.urls[1]
+        changes = [
+            (detail, lambda: Like.objects.create(post=self.post,
+                                                 user=self.user)),
+            (detail, lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Новый')),
+            (group, lambda: Group.objects.filter(pk=self.group.pk).update(
+                description='Другое', updated_at=timezone.now())),
+        ]
+        for url, change in changes:
+            etag = self.authorized_client.get(url)['ETag']
+            change()
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_author_rename_renews_validators(self):
+        """Проверяем, что правка имени автора меняет ETag ленты и поста."""
+        for url in (self.urls[0], self.urls[3]):
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                self.user.first_name = f'Автор {url}'
+                self.user.save()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_validators_differ_per_user(self):
+        """Проверяем, что аноним не получает 304 по ETag пользователя."""
+        etag = self.authorized_client.get(self.urls[3])['ETag']
+        response = self.client.get(self.urls[3], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_page_cache_hit_not_modified(self):
+        """Проверяем, что попадание в кэш страниц тоже отвечает 304."""
+        etag = self.client.get(self.urls[0])['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.urls[0],
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='trendy')
+        cls.fresh = Post.objects.create(author=cls.user, text='Свежий пост')
+        cls.stale = Post.objects.create(author=cls.user, text='Старый пост')
+
+    def test_recent_activity_ranks_higher(self):
+        """Проверяем, что старые события затухают и не держат пост наверху."""
+        now = time.time()
+        half_life = settings.TRENDING_HALF_LIFE
+        trending.record(self.stale.id, 3.0, now=now - 4 * half_life)
+        trending.record(self.fresh.id, 1.0, now=now)
+        posts = trending.top_posts(now=now)
+        self.assertEqual(posts, [self.fresh, self.stale])
+        self.assertAlmostEqual(posts[0].trending_score, 1.0)
+        self.assertAlmostEqual(posts[1].trending_score, 3.0 / 16)
+
+    def test_likes_and_comments_update_scores(self):
+        """Проверяем, что сигналы лайков и комментариев меняют счет."""
+        like = Like.objects.create(post=self.fresh, user=self.user, like=1)
+        Comment.objects.create(post=self.fresh, author=self.user, text='Да')
+        like.delete()
+        self.assertAlmostEqual(
+            trending.top_posts()[0].trending_score,
+            settings.TRENDING_WEIGHTS['comment'], places=3)
+        self.assertEqual(trending.rebuild(), 1)
+        self.assertEqual(trending.top_posts(), [self.fresh])
+
+    def test_deleted_comment_removes_its_own_weight(self):
+        """Проверяем, что удаление давнего комментария снимает только его
+        затухший вклад."""
+        half_life = settings.TRENDING_HALF_LIFE
+        comment = Comment.objects.create(post=self.fresh, author=self.user,
+                                         text='Давний')
+        TrendingScore.objects.all().delete()
+        created = comment.created - timedelta(seconds=2 * half_life)
+        Comment.objects.filter(pk=comment.pk).update(created=created)
+        trending.record(self.fresh.id, settings.TRENDING_WEIGHTS['comment'],
+                        now=created.timestamp())
+        trending.record(self.fresh.id, 1.0)
+        Comment.objects.get(pk=comment.pk).delete()
+        self.assertAlmostEqual(trending.top_posts()[0].trending_score, 1.0,
+                               places=3)
+
+    def test_deleted_like_removes_its_own_weight(self):
+        """Проверяем, что отмена давнего лайка снимает только его затухший
+        вклад, а пересчет берет время лайка, а не поста."""
+        half_life = settings.TRENDING_HALF_LIFE
+        like = Like.objects.create(post=self.fresh, user=self.user, like=1)
+        TrendingScore.objects.all().delete()
+        created = like.created - timedelta(seconds=2 * half_life)
+        Like.objects.filter(pk=like.pk).update(created=created)
+        trending.record(self.fresh.id, settings.TRENDING_WEIGHTS['like'],
+                        now=created.timestamp())
+        trending.record(self.fresh.id, 1.0)
+        self.assertEqual(trending.rebuild(), 1)
+        self.assertAlmostEqual(
+            trending.top_posts()[0].trending_score,
+            settings.TRENDING_WEIGHTS['like'] / 4, places=3)
+        trending.record(self.fresh.id, 1.0)
+        Like.objects.get(pk=like.pk).delete()
+        self.assertAlmostEqual(trending.top_posts()[0].trending_score, 1.0,
+                               places=3)
+
+    def test_compaction_rescales_and_prunes(self):
+        """Проверяем, что сжатие переносит эпоху и удаляет остывшие посты."""
+        now = time.time()
+        half_life = settings.TRENDING_HALF_LIFE
+        trending.record(self.stale.id, 1.0, now=now - 12 * half_life)
+        trending.record(self.fresh.id, 1.0, now=now)
+        self.assertEqual(trending.compact(now=now + half_life), 1)
+        score = TrendingScore.objects.get()
+        self.assertEqual(score.post_id, self.fresh.id)
+        self.assertAlmostEqual(score.score, 0.5)
+        self.assertAlmostEqual(
+            trending.top_posts(now=now + half_life)[0].trending_score, 0.5)
+        out = StringIO()
+        call_command('compact_trending', stdout=out)
+        self.assertIn('Удалено остывших постов: 0', out.getvalue())
+
+    def test_page_and_api_list_top_posts(self):
+        """Проверяем, что страница и API отдают посты по счету."""
+        Like.objects.create(post=self.stale, user=self.user, like=1)
+        Comment.objects.create(post=self.fresh, author=self.user, text='Да')
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'],
+                         [self.fresh, self.stale])
+        data = self.client.get(reverse('api_posts:trending')).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [self.fresh.id, self.stale.id])
+        self.assertAlmostEqual(data['results'][0]['score'],
+                               settings.TRENDING_WEIGHTS['comment'],
+                               places=2)
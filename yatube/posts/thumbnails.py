@@ -0,0 +1,63 @@
+"""Предварительная генерация миниатюр sorl-thumbnail при загрузке.
+
+Шаблоны запрашивают миниатюры с геометриями из
+POST_THUMBNAIL_GEOMETRIES; если они созданы заранее, первый просмотр
+поста читает готовый файл из kvstore вместо декодирования и ресайза.
+Там же строятся варианты для srcset (posts/images.py).
+Работа выполняется в пуле процессов (spawn), запрос не ждет ресайза.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+_executor = None
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def generate(name):
+    """Создает все миниатюры и варианты для файла из хранилища;
+    возвращает name"""
+    from sorl.thumbnail import get_thumbnail
+
+    from core.utils.versions import bump
+    from posts.images import make_variants
+    from posts.models import Post
+
+    for geometry, options in settings.POST_THUMBNAIL_GEOMETRIES:
+        get_thumbnail(name, geometry, **options)
+    width, height, widths = make_variants(name)
+    post_ids = list(Post.objects.filter(image=name)
+                    .values_list('pk', flat=True))
+    Post.objects.filter(pk__in=post_ids).update(
+        image_width=width, image_height=height,
+        image_variants=','.join(str(width) for width in widths))
+    bump(*(f'post:{pk}' for pk in post_ids))
+    return name
+
+
+def get_executor(max_workers=None):
+    global _executor
+    if max_workers is not None:
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    if _executor is None:
+        _executor = get_executor(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр поста в пул после коммита транзакции"""
+    if not post.image:
+        return
+    name = post.image.name
+    transaction.on_commit(lambda: get_executor().submit(generate, name))
@@ -0,0 +1,108 @@
+"""Материализованная лента подписок.
+
+Новый пост раскладывается пачками в ленты подписчиков автора, подписка
+догружает последние посты автора, отписка их вычищает. Лента каждого
+пользователя ограничена TIMELINE_MAX_ENTRIES записями, хвост удаляет
+команда prune_timelines.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+from posts.models import Follow, Post, TimelineEntry
+
+
+def _max_entries():
+    return getattr(settings, 'TIMELINE_MAX_ENTRIES', 1000)
+
+
+def _batch_size():
+    return getattr(settings, 'TIMELINE_FANOUT_BATCH', 500)
+
+
+def fan_out_post(post):
+    """Добавляет пост в ленты всех подписчиков автора"""
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .order_by('user_id')
+                 .values_list('user_id', flat=True))
+    batch_size = _batch_size()
+    last_user_id = 0
+    while True:
+        user_ids = list(followers.filter(user_id__gt=last_user_id)
+                        [:batch_size])
+        if not user_ids:
+            break
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post.pk,
+                           author_id=post.author_id, pub_date=post.pub_date)
+             for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        last_user_id = user_ids[-1]
+
+
+def fan_out_posts(post_ids):
+    """Добавляет посты post_ids, вставленные в обход сигналов, в ленты
+    подписчиков их авторов"""
+    posts = list(Post.objects.filter(id__in=post_ids)
+                 .values_list('id', 'author_id', 'pub_date'))
+    followers = defaultdict(list)
+    for user_id, author_id in (
+            Follow.objects.filter(author_id__in={
+                author_id for _, author_id, _ in posts})
+            .values_list('user_id', 'author_id')):
+        followers[author_id].append(user_id)
+    entries = []
+    for post_id, author_id, pub_date in posts:
+        for user_id in followers[author_id]:
+            entries.append(TimelineEntry(user_id=user_id, post_id=post_id,
+                                         author_id=author_id,
+                                         pub_date=pub_date))
+            if len(entries) >= _batch_size():
+                TimelineEntry.objects.bulk_create(entries,
+                                                  ignore_conflicts=True)
+                entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Загружает в ленту последние посты автора после подписки"""
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date', '-id')
+             .values_list('id', 'pub_date')[:_max_entries()])
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id,
+                       author_id=author_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        batch_size=_batch_size(),
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает посты автора из ленты после отписки"""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def prune(max_entries=None):
+    """Обрезает ленты до max_entries новейших записей; возвращает число
+    удаленных записей"""
+    if max_entries is None:
+        max_entries = _max_entries()
+    deleted = 0
+    user_ids = (TimelineEntry.objects.order_by()
+                .values_list('user_id', flat=True).distinct())
+    for user_id in list(user_ids):
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        newest = entries.order_by('-pub_date', '-id')
+        boundary = newest.values_list('pub_date', 'id')[
+            max_entries:max_entries + 1]
+        if not boundary:
+            continue
+        pub_date, entry_id = boundary[0]
+        stale = entries.filter(pub_date__lt=pub_date) | entries.filter(
+            pub_date=pub_date, id__lte=entry_id)
+        count, _ = stale.delete()
+        deleted += count
+    return deleted
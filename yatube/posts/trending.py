@@ -0,0 +1,163 @@
+"""«Популярное»: посты с наибольшим затухающим счетом лайков и
+комментариев.
+
+Счет события затухает вдвое за TRENDING_HALF_LIFE секунд. Чтобы не
+переписывать все строки при каждом чтении, TrendingScore хранит счет в
+масштабе эпохи TrendingEpoch: событие в момент t добавляет
+weight * 2 ** ((t - epoch) / half_life). Множитель затухания общий для
+всех постов, поэтому порядок хранимых счетов совпадает с порядком
+текущих и верх списка читается по индексу trending_score_idx без
+агрегатов по Like и Comment.
+
+Команда compact_trending переносит эпоху на текущий момент (счета
+умножаются на накопленное затухание) и удаляет остывшие посты, иначе
+множитель роста переполнит float.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Power
+from django.utils import timezone
+
+from posts.models import Comment, Like, TrendingEpoch, TrendingScore
+
+# Через столько периодов полураспада событие весит меньше 0.001
+REBUILD_HALF_LIVES = 10
+# Эпоха — единственная строка TrendingEpoch с этим ключом
+EPOCH_ID = 1
+
+
+def _float(value):
+    return Value(value, output_field=FloatField())
+
+
+def _epoch(now):
+    """Эпоха счетов; ее задает первое событие"""
+    epoch, _ = TrendingEpoch.objects.get_or_create(
+        pk=EPOCH_ID, defaults={'timestamp': now})
+    return epoch.timestamp
+
+
+def _half_lives_since_epoch(now):
+    """Выражение (now - epoch) / half_life; без эпохи — 0"""
+    epoch = Coalesce(
+        Subquery(TrendingEpoch.objects.filter(pk=EPOCH_ID)
+                 .values('timestamp')),
+        _float(now), output_field=FloatField())
+    return ExpressionWrapper(
+        (_float(now) - epoch) / _float(settings.TRENDING_HALF_LIFE),
+        output_field=FloatField())
+
+
+def record(post_id, weight, now=None):
+    """Добавляет посту событие веса weight (отрицательный — отмена)"""
+    now = time.time() if now is None else now
+    scores = TrendingScore.objects.filter(post_id=post_id)
+    change = {'score': Greatest(
+        F('score') + _float(weight) * Power(
+            _float(2.0), _half_lives_since_epoch(now)),
+        _float(0.0), output_field=FloatField())}
+    if scores.update(**change) or weight <= 0:
+        return
+    # Первое событие поста: множитель роста считаем сами
+    score = weight * 2 ** ((now - _epoch(now)) / settings.TRENDING_HALF_LIFE)
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(post_id=post_id, score=score)
+    except IntegrityError:
+        # Строку только что вставил параллельный запрос
+        scores.update(**change)
+
+
+def _set_epoch(now):
+    TrendingEpoch.objects.update_or_create(
+        pk=EPOCH_ID, defaults={'timestamp': now})
+
+
+def compact(now=None):
+    """Переносит эпоху на now и удаляет счета ниже TRENDING_MIN_SCORE;
+    возвращает число удаленных постов"""
+    now = time.time() if now is None else now
+    with transaction.atomic():
+        # Сначала запись: SQLite сразу берет блокировку на запись
+        TrendingScore.objects.update(score=F('score') * Power(
+            _float(0.5), _half_lives_since_epoch(now)))
+        removed, _ = TrendingScore.objects.filter(
+            score__lt=settings.TRENDING_MIN_SCORE).delete()
+        _set_epoch(now)
+    return removed
+
+
+def rebuild(now=None):
+    """Пересчитывает счета по комментариям и лайкам — после импорта и
+    генерации данных, которые обходят сигналы. Возвращает число постов
+    в списке"""
+    now = time.time() if now is None else now
+    half_life = settings.TRENDING_HALF_LIFE
+    weights = settings.TRENDING_WEIGHTS
+    since = (timezone.now()
+             - timedelta(seconds=half_life * REBUILD_HALF_LIVES))
+    events = (
+        (weights['comment'], Comment.objects.filter(created__gte=since)
+         .values_list('post_id', 'created')),
+        (weights['like'], Like.objects.filter(created__gte=since)
+         .values_list('post_id', 'created')),
+    )
+    scores = defaultdict(float)
+    for weight, moments in events:
+        for post_id, moment in moments.iterator():
+            scores[post_id] += weight * 2 ** (
+                (moment.timestamp() - now) / half_life)
+    rows = [TrendingScore(post_id=post_id, score=score)
+            for post_id, score in scores.items()
+            if score >= settings.TRENDING_MIN_SCORE]
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(rows, batch_size=500)
+        _set_epoch(now)
+    return len(rows)
+
+
+def record_comments(comment_ids, now=None, batch_size=500):
+    """Добавляет в счета комментарии comment_ids, вставленные в обход
+    сигналов, — после импорта"""
+    now = time.time() if now is None else now
+    half_life = settings.TRENDING_HALF_LIFE
+    since = (timezone.now()
+             - timedelta(seconds=half_life * REBUILD_HALF_LIVES))
+    comment_ids = sorted(comment_ids)
+    weights = defaultdict(float)
+    for start in range(0, len(comment_ids), batch_size):
+        moments = (Comment.objects
+                   .filter(id__in=comment_ids[start:start + batch_size],
+                           created__gte=since)
+                   .values_list('post_id', 'created'))
+        for post_id, moment in moments:
+            # Вес, равный вкладу комментария, если бы он пришел в now
+            weights[post_id] += settings.TRENDING_WEIGHTS['comment'] * 2 ** (
+                (moment.timestamp() - now) / half_life)
+    for post_id, weight in weights.items():
+        record(post_id, weight, now)
+    return len(weights)
+
+
+def top_posts(limit=None, now=None):
+    """Посты с наибольшим счетом; текущий счет — в post.trending_score"""
+    now = time.time() if now is None else now
+    limit = settings.TRENDING_SIZE if limit is None else limit
+    epoch = (TrendingEpoch.objects.filter(pk=EPOCH_ID)
+             .values_list('timestamp', flat=True).first())
+    decay = (1.0 if epoch is None
+             else 2 ** ((epoch - now) / settings.TRENDING_HALF_LIFE))
+    scores = (TrendingScore.objects
+              .select_related('post__author', 'post__group')
+              .order_by('-score')[:limit])
+    posts = []
+    for score in scores:
+        score.post.trending_score = score.score * decay
+        posts.append(score.post)
+    return posts
@@ -1,25 +1,35 @@
 from django.contrib.auth.decorators import login_required
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
-from .views import (CommentCreateView, FollowIndexListView, GroupPostsListView,
-                    IndexListView, LikePostView, PostCreateView,
-                    PostDetailView, PostEditView, ProfileFollowView,
-                    ProfileListView, ProfileUnfollowView, UnlikePost)
+from core.utils.page_cache import anonymous_cache_page
+
+from . import generations
+from .views import (CommentCreateView, CommentListView, FollowIndexListView,
+                    GroupPostsListView, IndexListView, LikePostView,
+                    LikeToggleView, PostCreateView, PostDetailView,
+                    PostEditView, ProfileFollowView, ProfileListView,
+                    ProfileUnfollowView, TrendingListView, UnlikePost)
 
 app_name = 'posts'
 
 urlpatterns = [
     path('',
-         IndexListView.as_view(),
+         anonymous_cache_page(generations.index_page)(
+             IndexListView.as_view()),
          name='index'),
 
+    path('trending/',
+         TrendingListView.as_view(),
+         name='trending'),
+
     path('group/<slug:slug>/',
-         GroupPostsListView.as_view(),
+         anonymous_cache_page(generations.group_page)(
+             GroupPostsListView.as_view()),
          name='group_list'),
 
     path('profile/<str:username>/',
-         ProfileListView.as_view(),
+         anonymous_cache_page(generations.profile_page)(
+             ProfileListView.as_view()),
          name='profile'),
 
     path('create/',
@@ -34,6 +44,10 @@ urlpatterns = [
          login_required(CommentCreateView.as_view()),
          name='add_comment'),
 
+    path('posts/<int:post_id>/comments/',
+         CommentListView.as_view(),
+         name='comments'),
+
     path('posts/<int:post_id>/edit/',
          login_required(PostEditView.as_view()),
          name='post_edit'),
@@ -57,4 +71,8 @@ urlpatterns = [
     path('posts/<int:post_id>/unlike/',
          login_required(UnlikePost.as_view()),
          name='post_unlike'),
+
+    path('posts/<int:post_id>/like/toggle/',
+         login_required(LikeToggleView.as_view()),
+         name='post_like_toggle'),
 ]
@@ -1,98 +1,221 @@
 from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
 from django.views.generic.edit import CreateView, FormView, UpdateView
 from django.views.generic.list import ListView, View
 
+from core.utils.conditional import ConditionalGetMixin, conditional_response
+from core.utils.pagination import (CURSOR_PARAM, CursorPaginator,
+                                   FeedPaginationMixin)
+from posts import conditional, follows, likes, thumbnails, trending
+from posts.counters import author_stats
 from posts.forms import CommentForm
-from posts.models import Comment, Follow, Group, Like, Post, User
+from posts.models import Comment, Group, Like, Post, TimelineEntry, User
+from posts.search import search_posts
 
 
-class IndexListView(ListView):
+def comments_page(post_id, cursor=None):
+    """Страница комментариев поста от старых к новым по (created, id)"""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE, ordering=('created', 'id'))
+    return paginator.page(cursor)
+
+
+class FeedStateMixin(ConditionalGetMixin):
+    """ETag и Last-Modified ленты по окну текущей страницы"""
+    # Поле строки ленты с id поста
+    post_id_field = 'pk'
+
+    def get_page_state(self):
+        window = self.cursor_window(self.get_queryset())
+        if window is None:
+            # Номера страниц зависят от числа всех постов ленты
+            return None
+        return conditional.feed_state(window.values(self.post_id_field))
+
+
+class IndexListView(FeedStateMixin, FeedPaginationMixin, ListView):
     """Главная страница с функцией поиска постов по ключевому слову"""
+    query_budget = 5
     model = Post
     template_name = 'posts/index.html'
     paginate_by = settings.AMOUNT_POSTS
 
+    def get_keyword(self):
+        return self.request.GET.get('q', '').strip()
+
+    def use_cursor_pagination(self):
+        # Результаты поиска упорядочены по релевантности, а не по pub_date
+        if self.get_keyword():
+            return False
+        return super().use_cursor_pagination()
+
     def get_queryset(self):
-        keyword = self.request.GET.get("q", None)
+        keyword = self.get_keyword()
+        page_obj = Post.objects.select_related('author', 'group')
         if keyword:
-            page_obj = Post.objects.select_related('author', 'group').filter(
-                text__contains=keyword)
-        else:
-            page_obj = Post.objects.select_related('author', 'group')
+            page_obj = search_posts(page_obj, keyword)
         return page_obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Последние обновления на сайте'
+        context['keyword'] = self.get_keyword()
         return context
 
 
-class GroupPostsListView(ListView):
+class TrendingListView(ListView):
+    """Популярные посты по затухающему счету лайков и комментариев"""
+    query_budget = 4
+    template_name = 'posts/trending.html'
+    context_object_name = 'posts'
+
+    def get_queryset(self):
+        return trending.top_posts(settings.TRENDING_SIZE)
+
+
+class GroupPostsListView(FeedStateMixin, FeedPaginationMixin, ListView):
     """Страница постов привязанная к конкретной группе"""
+    query_budget = 6
     model = Post
     template_name = 'posts/group_list.html'
     paginate_by = settings.AMOUNT_POSTS
 
+    @cached_property
+    def group(self):
+        return get_object_or_404(Group, slug=self.kwargs.get('slug'))
+
     def get_queryset(self):
-        group = get_object_or_404(Group, slug=self.kwargs.get('slug'))
-        queryset = group.posts.select_related('author')
+        queryset = self.group.posts.select_related('author')
         return queryset
 
+    def get_page_state(self):
+        state = super().get_page_state()
+        if state is not None:
+            state['group_modified'] = self.group.updated_at
+        return state
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(
-            Group, slug=self.kwargs.get('slug')
-        )
+        context['group'] = self.group
         return context
 
 
-class ProfileListView(ListView):
+class ProfileListView(FeedStateMixin, FeedPaginationMixin, ListView):
     """Карточка профайла автора с возможностью подписаться или отписаться"""
+    query_budget = 7
     model = Post
     template_name = 'posts/profile.html'
     paginate_by = settings.AMOUNT_POSTS
 
+    @cached_property
+    def author(self):
+        return get_object_or_404(User.objects.select_related('stats'),
+                                 username=self.kwargs.get('username'))
+
+    @cached_property
+    def stats(self):
+        return author_stats(self.author)
+
+    @cached_property
+    def following(self):
+        return follows.is_following(self.request.user, self.author)
+
     def get_queryset(self):
-        author = get_object_or_404(User, username=self.kwargs.get('username'))
-        queryset = author.posts.select_related('group')
+        queryset = self.author.posts.select_related('group')
         return queryset
 
+    def get_page_state(self):
+        state = super().get_page_state()
+        if state is not None:
+            state['stats'] = (self.stats.posts_count,
+                              self.stats.followers_count,
+                              self.stats.following_count)
+            state['following'] = self.following
+        return state
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['author'] = get_object_or_404(
-            User, username=self.kwargs.get('username'))
-        context['posts'] = self.get_queryset()
-        if self.request.user.is_authenticated:
-            context['following'] = context['author'].following.select_related(
-                'user'
-            )
-        else:
-            context['following'] = False
+        context['author'] = self.author
+        context['stats'] = self.stats
+        context['following'] = self.following
         return context
 
 
-class PostDetailView(FormView):
+class PostDetailView(ConditionalGetMixin, FormView):
     """Карточка поста с формой комментария и лайками"""
+    query_budget = 6
+    # GET читает из копии базы, как ListView (core/middleware.py)
+    replica_reads = True
     form_class = CommentForm
     template_name = 'posts/post_detail.html'
 
+    def get_page_state(self):
+        return conditional.post_state(self.kwargs.get('post_id'))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['post'] = get_object_or_404(
-            Post, id=self.kwargs.get('post_id'))
-        context['posts'] = context['post'].author.posts.count()
-        context['comments'] = context['post'].comments.select_related('author')
+            Post.objects.select_related('author__stats', 'group'),
+            id=self.kwargs.get('post_id'))
+        context['posts'] = author_stats(context['post'].author).posts_count
+        context['comments_page'] = comments_page(
+            context['post'].id, self.request.GET.get('comments'))
+        context['comments'] = context['comments_page'].object_list
         if self.request.user.is_authenticated:
-            context['likes'] = context['post'].likes.select_related('user')
             context['like_record'] = Like.objects.filter(
-                post_id=self.kwargs.get('post_id'), user=self.request.user)
+                post_id=self.kwargs.get('post_id'),
+                user=self.request.user).exists()
         return context
 
 
+class CommentListView(View):
+    """Следующая страница комментариев: HTML-фрагмент для подгрузки на
+    странице поста или JSON по Accept: application/json"""
+    query_budget = 4
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        post_id = self.kwargs.get('post_id')
+        state = conditional.post_state(post_id)
+        if state is None:
+            raise Http404
+        wants_json = 'application/json' in request.headers.get('Accept', '')
+        state['json'] = wants_json
+        response = conditional_response(
+            request, state, lambda: self.respond(post_id, wants_json))
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def respond(self, post_id, wants_json):
+        request = self.request
+        page = comments_page(post_id, request.GET.get(CURSOR_PARAM))
+        if not wants_json:
+            return render(request, 'posts/includes/comments.html',
+                          {'comments': page.object_list,
+                           'comments_page': page, 'post_id': post_id})
+        next_url = None
+        if page.next_cursor:
+            next_url = (reverse('posts:comments', args=[post_id])
+                        + '?' + urlencode({CURSOR_PARAM: page.next_cursor}))
+        return JsonResponse({
+            'results': [{'id': comment.id,
+                         'author': comment.author.username,
+                         'text': comment.text,
+                         'created': comment.created.isoformat()}
+                        for comment in page.object_list],
+            'next': next_url,
+        })
+
+
 class PostCreateView(CreateView):
     """Создание поста"""
+    query_budget = {'GET': 3, 'POST': 9}
     model = Post
     template_name = 'posts/create_post.html'
     fields = ['text', 'group', 'image']
@@ -102,25 +225,39 @@ class PostCreateView(CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        thumbnails.schedule(self.object)
+        return response
 
 
 class PostEditView(UpdateView):
     """Редактирование поста"""
+    query_budget = {'GET': 4, 'POST': 9}
     model = Post
     template_name = 'posts/create_post.html'
     fields = ['text', 'group', 'image']
     pk_url_kwarg = 'post_id'
 
     def dispatch(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs.get('post_id'))
-        if self.request.user != post.author:
+        self.instance = get_object_or_404(
+            Post.objects.select_related('author'),
+            id=self.kwargs.get('post_id'))
+        if self.request.user.id != self.instance.author_id:
             return redirect('posts:post_detail', self.kwargs.get('post_id'))
         return super().dispatch(request, *args, **kwargs)
 
+    def get_object(self, queryset=None):
+        return self.instance
+
     def get_success_url(self):
         return reverse_lazy('posts:post_detail', args=[self.object.id])
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(self.object)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_edit'] = True
@@ -129,6 +266,7 @@ class PostEditView(UpdateView):
 
 class CommentCreateView(CreateView):
     """Создание комментарий"""
+    query_budget = {'POST': 6}
     model = Comment
     fields = ['text']
 
@@ -143,54 +281,76 @@ class CommentCreateView(CreateView):
         return super().form_valid(form)
 
 
-class FollowIndexListView(ListView):
+class FollowIndexListView(FeedStateMixin, FeedPaginationMixin, ListView):
     """Отображение постов любимых авторов"""
+    query_budget = 5
+    post_id_field = 'post_id'
     model = Post
     template_name = 'posts/follow.html'
     paginate_by = settings.AMOUNT_POSTS
 
     def get_queryset(self):
-        future_posts = Post.objects.filter(
-            author__following__user=self.request.user)
-        return future_posts
+        return TimelineEntry.objects.filter(
+            user=self.request.user).select_related('post__author',
+                                                   'post__group')
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, entries, is_paginated = super().paginate_queryset(
+            queryset, page_size)
+        page.object_list = [entry.post for entry in entries]
+        return paginator, page, page.object_list, is_paginated
 
 
 class ProfileFollowView(View):
+    query_budget = 11
+
     # Подписаться на автора
     def get(self, request, *args, **kwargs):
         author = get_object_or_404(User, username=self.kwargs.get('username'))
-        if request.user != author:
-            Follow.objects.get_or_create(user=request.user, author=author)
+        follows.follow(request.user, author)
         return redirect('posts:profile', author.username)
 
 
 class ProfileUnfollowView(View):
     """Отписка от автора"""
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         author = get_object_or_404(User, username=self.kwargs.get('username'))
-        unfollowing = Follow.objects.filter(user=request.user, author=author)
-        unfollowing.delete()
+        follows.unfollow(request.user, author)
         return redirect('posts:profile', author.username)
 
 
-class LikePostView(ListView):
+class LikePostView(View):
     """Лайк"""
+    query_budget = 6
 
     def get(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs.get('post_id'))
-        if self.request.user.is_authenticated:
-            Like.objects.get_or_create(post_id=post.id,
-                                       user=request.user,
-                                       like=1)
+        post = get_object_or_404(Post.objects.only('id'),
+                                 id=self.kwargs.get('post_id'))
+        likes.add_like(post.id, request.user)
         return redirect('posts:post_detail', post.id)
 
 
-class UnlikePost(ListView):
+class UnlikePost(View):
     """Дизлайк"""
+    query_budget = 6
 
     def get(self, request, *args, **kwargs):
-        record_like = Like.objects.filter(
-            post_id=self.kwargs.get('post_id'), user=request.user)
-        record_like.delete()
+        likes.remove_like(self.kwargs.get('post_id'), request.user)
         return redirect('posts:post_detail', self.kwargs.get('post_id'))
+
+
+class LikeToggleView(View):
+    """Ставит или снимает лайк одним POST; fetch получает JSON с новым
+    числом лайков, обычная форма — редирект на пост"""
+    query_budget = 10
+
+    def post(self, request, *args, **kwargs):
+        post_id = self.kwargs.get('post_id')
+        if not Post.objects.filter(id=post_id).exists():
+            raise Http404
+        liked, likes_count = likes.toggle_like(post_id, request.user)
+        if 'application/json' in request.headers.get('Accept', ''):
+            return JsonResponse({'liked': liked, 'likes_count': likes_count})
+        return redirect('posts:post_detail', post_id)
@@ -0,0 +1,24 @@
+// Подгрузка следующих комментариев HTML-фрагментом вместо перехода
+// на страницу поста со следующей порцией.
+document.addEventListener('click', function (event) {
+  var more = event.target.closest('[data-comments-more]');
+  if (!more) {
+    return;
+  }
+  event.preventDefault();
+  more.classList.add('disabled');
+  fetch(more.dataset.commentsMore, {
+    headers: {'Accept': 'text/html'},
+    credentials: 'same-origin'
+  }).then(function (response) {
+    if (!response.ok) {
+      throw new Error(response.statusText);
+    }
+    return response.text();
+  }).then(function (html) {
+    more.insertAdjacentHTML('beforebegin', html);
+    more.remove();
+  }).catch(function () {
+    window.location.href = more.href;
+  });
+});
@@ -0,0 +1,27 @@
+// Лайк без перезагрузки страницы: форма уходит через fetch, а число
+// лайков обновляется из JSON-ответа. Без JS форма работает как обычно.
+document.querySelectorAll('form[data-like-toggle]').forEach(function (form) {
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    var button = form.querySelector('button');
+    button.disabled = true;
+    fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: {'Accept': 'application/json'},
+      credentials: 'same-origin'
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.json();
+    }).then(function (data) {
+      form.querySelector('[data-likes-count]').textContent = data.likes_count;
+      button.setAttribute('aria-pressed', data.liked ? 'true' : 'false');
+    }).catch(function () {
+      form.submit();
+    }).finally(function () {
+      button.disabled = false;
+    });
+  });
+});
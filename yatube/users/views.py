@@ -5,6 +5,7 @@ from .forms import CreationForm
 
 
 class SingUp(CreateView):
+    query_budget = {'GET': 2, 'POST': 6}
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
@@ -1,4 +1,5 @@
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,7 +13,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-DEBUG = True
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = os.getenv('DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -41,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.QueryAuditMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -87,14 +93,69 @@ DATABASES = {
     }
 }
 
+# Профиль базы (core/database.py): 'production' включает WAL, busy_timeout
+# и кэш страниц для каждого соединения и держит соединения между запросами
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'default')
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+SQLITE_PRAGMAS = {}
+if DATABASE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+
+# Копии базы только для чтения для лент и карточек постов
+# (core/replication.py); обновляет их команда refresh_replicas
+DATABASE_REPLICAS = {
+    f'replica{index}': os.path.join(BASE_DIR, f'db.replica{index}.sqlite3')
+    for index in range(int(os.getenv('SQLITE_REPLICAS', 0)))
+}
+# Без CONN_MAX_AGE: постоянное соединение читало бы подмененный файл копии
+for _alias, _path in DATABASE_REPLICAS.items():
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{_path}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Копия старше этого числа секунд не читается; столько же после записи
+# клиент читает основную базу
+REPLICA_MAX_LAG = 15
+REPLICA_REFRESH_INTERVAL = 5
+REPLICA_STICKY_COOKIE = 'primary_reads'
+
 # Caching
 
+# Общий для всех воркеров хоста кэш в SQLite (core/cache/sqlite.py)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
 
+# Хранилище сессий: 'db' — таблица django_session; 'cache' — общий кэш с
+# записью в базу (чтение без запроса, пока сессия в кэше); 'signed' —
+# подписанная cookie без обращения к серверу, но ее нельзя отозвать до
+# истечения срока, а содержимое видно клиенту
+SESSION_STORE = os.getenv('SESSION_STORE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'signed': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_STORE]
+# Сколько секунд request.user живет в кэше (core/auth.py)
+USER_CACHE_TIMEOUT = 60 * 15
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -135,6 +196,21 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# 'hashed' (core/staticfiles.py): collectstatic пишет имена с хэшем
+# содержимого и копии .gz/.br (для .br нужен пакет brotli), а
+# StaticFilesMiddleware отдает их с immutable Cache-Control. Перед
+# запуском в этом режиме нужен collectstatic
+STATIC_PIPELINE = os.getenv('STATIC_PIPELINE', 'off')
+if STATIC_PIPELINE == 'hashed':
+    if DEBUG:
+        # При DEBUG хранилище манифеста отдает {% static %} имена без
+        # хэша, и immutable-кэширование не работает
+        raise ImproperlyConfigured('STATIC_PIPELINE=hashed требует DEBUG=0')
+    STATICFILES_STORAGE = (
+        'core.staticfiles.CompressedManifestStaticFilesStorage')
+# Кэширование файлов статики без хэша в имени, секунд
+STATIC_MAX_AGE = 60
 
 # Change template error 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -145,6 +221,51 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # My vars for yatube app
 AMOUNT_POSTS = 10
+# 'cursor' — пагинация по (pub_date, id), 'numbered' — классические ?page=N
+FEED_PAGINATION = 'cursor'
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGINATION_WINDOW = 2
+# Комментариев на странице поста и в каждой подгружаемой порции
+COMMENTS_PER_PAGE = 20
+# Лента подписок: предел записей на пользователя и размер пачки рассылки
+TIMELINE_MAX_ENTRIES = 1000
+TIMELINE_FANOUT_BATCH = 500
+# «Популярное» (posts/trending.py): вес событий, период полураспада счета
+# в секундах, порог удаления при сжатии и длина списка. Команду
+# compact_trending запускать хотя бы раз в сутки: множитель роста
+# переполнит float примерно через 256 периодов полураспада
+TRENDING_WEIGHTS = {'like': 1.0, 'comment': 2.0}
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_MIN_SCORE = 0.05
+TRENDING_SIZE = 20
+# Время жизни кэша карточек постов; актуальность держат версии ключей
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Сколько попаданий и промахов карточек копить в процессе до записи в кэш
+POST_CARD_STATS_FLUSH_EVERY = 100
+# Полностраничный кэш лент для анонимов; актуальность держат поколения
+PAGE_CACHE_TIMEOUT = 60 * 5
+# Миниатюры, которые шаблоны запрашивают через {% thumbnail %}; создаются
+# заранее при сохранении поста (posts/thumbnails.py)
+POST_THUMBNAIL_GEOMETRIES = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_WORKERS = 2
+# Варианты картинок для srcset: ширины и пропорции карточки поста
+POST_IMAGE_VARIANT_WIDTHS = [320, 640, 960]
+POST_IMAGE_ASPECT = (960, 339)
+# Бюджеты SQL-запросов view (core/middleware.py): 'off', 'log' для выборочной
+# проверки в проде или 'strict'; тестовый раннер включает 'strict'
+QUERY_AUDIT = os.getenv('QUERY_AUDIT', 'off')
+QUERY_AUDIT_SAMPLE_RATE = 0.01
+TEST_RUNNER = 'core.test_runner.QueryAuditRunner'
+# Метрики запросов (core/metrics.py): общая для воркеров база, как часто
+# воркер сбрасывает в нее накопленное и кому доступен /metrics
+METRICS_ENABLED = True
+METRICS_DATABASE = os.path.join(BASE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 10
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+# Если задан, /metrics требует Authorization: Bearer <токен> с любого адреса
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -18,6 +18,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('posts.urls', namespace='posts')),
@@ -25,6 +27,7 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('api/', include('api.urls', namespace='api_posts')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 handler403 = 'core.views.permission_denied'